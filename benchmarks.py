@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import importlib
+import subprocess
+import shutil
+import pandas as pd
+import synthetic_data
+from instrumentation import trace_run
+
+# Wall time and peak memory of every script's main() on synthetic data.
+# A scale's data folder is generated once under BENCH_DIR (synthetic_data.py,
+# fixed seed) and reused, so runs on different commits see identical inputs.
+# Each case runs in a fresh interpreter with DIVVY_DATA_DIR pointed at that
+# folder and its cwd set so "../output" lands next to it. The parent times
+# the child and reads its CPU time from os.wait4; the child reports its own
+# peak RSS from its instrumentation trace (ru_maxrss inherits the parent's
+# peak across fork and exec) and that of its pool workers. Times include
+# interpreter start and imports, like running the script by hand.
+#
+# Cases run in pipeline order and each one finds the caches of the cases
+# before it, so it times its own step: ingest (CSV -> parquet store), cube
+# (hourly resample), weather, weather_response (join + binned percentiles),
+# ..., od/summary/maps (station aggregation), features, models (model fit,
+# DIVVY_RETRAIN=1). A run that includes ingest first deletes everything
+# derived in the data folder; a run of only later cases reuses what is there.
+# Results are appended to HISTORY_CSV with the git commit and compared with
+# the previous run at the same scale.
+#
+#   python benchmarks.py 1m
+#   python benchmarks.py 10m --cases ingest cube --repeat 3
+
+BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR   = os.environ.get("DIVVY_BENCH_DIR", os.path.join(BASE_DIR, "..", "bench"))
+OUTPUT_DIR  = "../output"
+HISTORY_CSV = os.path.join(OUTPUT_DIR, "benchmark_history.csv")
+REPEATS     = 1          # best time / worst memory of this many runs per case
+SOURCES     = ["bikes_raw", "weather", "weather_raw", "synthetic.json"]   # kept when resetting
+
+# case -> module whose main() it runs, in dependency order
+CASES = {
+    "ingest":           "trip_store",
+    "cube":             "ride_counts",
+    "weather":          "weather",
+    "weather_response": "weather_response",
+    "precipitation":    "precipitation_analysis",
+    "rain_temp":        "daily_precip_temp_trends",
+    "heatmap":          "heatmap_analysis",
+    "monthly":          "monthly_trends",
+    "summary":          "dataset_summary",
+    "od":               "od_matrix",
+    "maps":             "maps_analysis",
+    "features":         "feature_store",
+    "models":           "ride_predictor_app",
+}
+
+# --- child side --------------------------------------------------------------
+
+def redirect_outputs(output_dir):
+    # modules with absolute output paths; the rest write to cwd-relative ../output
+    if "dataset_summary" in sys.modules:
+        sys.modules["dataset_summary"].OUTPUT_DIR = output_dir
+    if "ride_predictor_app" in sys.modules:
+        from pathlib import Path
+        sys.modules["ride_predictor_app"].EVAL_DIR = Path(output_dir) / "evaluation_results"
+
+def run_case(name, result_path):
+    # the case's main() becomes a stage of this run, whose record has the peak
+    with trace_run(f"benchmark_{name}") as st:
+        module = importlib.import_module(CASES[name])
+        redirect_outputs(os.path.abspath(OUTPUT_DIR))
+        sys.argv = [module.__file__]
+        module.main()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024   # pool workers
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"peak_rss_mb": max(st.record["peak_rss_mb"], children)}, f)
+
+# --- parent side -------------------------------------------------------------
+
+def scale_dirs(scale):
+    root = os.path.abspath(os.path.join(BENCH_DIR, f"divvy-{scale}"))
+    return {"root": root, "data": os.path.join(root, "data"),
+            "work": os.path.join(root, "work"), "output": os.path.join(root, "output")}
+
+def ensure_data(scale, dirs):
+    # generate the synthetic inputs for this scale once
+    marker = os.path.join(dirs["data"], "synthetic.json")
+    rows = synthetic_data.SCALES.get(scale) or int(scale)
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            return json.load(f)["rows"]
+    print(f"🧪 Generating {rows:,} synthetic trips in {dirs['data']}…")
+    shutil.rmtree(dirs["data"], ignore_errors=True)
+    synthetic_data.generate(dirs["data"], rows)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "seed": synthetic_data.SEED, "start": synthetic_data.START_MONTH,
+                   "months": synthetic_data.MONTHS}, f)
+    return rows
+
+def reset_derived(dirs):
+    # drop stores, caches, models and outputs; keep the generated sources
+    for entry in os.listdir(dirs["data"]):
+        if entry not in SOURCES:
+            path = os.path.join(dirs["data"], entry)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    shutil.rmtree(dirs["output"], ignore_errors=True)
+
+def measure(name, dirs):
+    # run one case in a fresh interpreter -> (seconds, cpu seconds, peak MB, status)
+    env = dict(os.environ, DIVVY_DATA_DIR=dirs["data"], DIVVY_WEATHER_DIR=os.path.join(dirs["data"], "weather"),
+               DIVVY_RETRAIN="1", MPLBACKEND="Agg")
+    os.makedirs(dirs["work"], exist_ok=True)
+    result_path = os.path.join(dirs["root"], f"{name}.json")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    with open(os.path.join(dirs["root"], f"{name}.log"), "w", encoding="utf-8") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run-case", name, result_path],
+                                cwd=dirs["work"], env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)   # already reaped by wait4
+    cpu = usage.ru_utime + usage.ru_stime
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        return seconds, cpu, float("nan"), f"exit {proc.returncode}"
+    with open(result_path, encoding="utf-8") as f:
+        return seconds, cpu, json.load(f)["peak_rss_mb"], "ok"
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_suite(scale, cases=None, repeats=REPEATS):
+    cases = [c for c in CASES if c in cases] if cases else list(CASES)
+    dirs = scale_dirs(scale)
+    rows = ensure_data(scale, dirs)
+    runs = {}
+    for r in range(repeats):
+        if "ingest" in cases:
+            reset_derived(dirs)
+        for name in cases:
+            seconds, cpu, rss, status = measure(name, dirs)
+            runs.setdefault(name, []).append({"seconds": seconds, "cpu_s": cpu,
+                                              "peak_rss_mb": rss, "status": status})
+            mark = "✅" if status == "ok" else "❌"
+            print(f"{mark} [{r + 1}/{repeats}] {name}: {seconds:.2f}s, {rss:.0f} MB peak ({status})")
+    results = {}
+    for name, tries in runs.items():
+        ok = [t for t in tries if t["status"] == "ok"] or tries
+        results[name] = dict(min(ok, key=lambda t: t["seconds"]),
+                             peak_rss_mb=max(t["peak_rss_mb"] for t in tries))
+    stamp = pd.Timestamp.now().isoformat(timespec="seconds")
+    commit = git_commit()
+    return pd.DataFrame([{"timestamp": stamp, "commit": commit, "scale": scale, "rows": rows,
+                          "case": name, **res} for name, res in results.items()])
+
+def compare(run, history):
+    # this run's cases next to the latest earlier run of each at the same scale
+    prev = history[(history["scale"] == run["scale"].iloc[0]) & (history["status"] == "ok")]
+    prev = prev.drop_duplicates("case", keep="last").set_index("case")
+    table = run.set_index("case")[["seconds", "peak_rss_mb", "status"]].copy()
+    table["prev_commit"] = prev["commit"].reindex(table.index)
+    table["time_change"] = table["seconds"] / prev["seconds"].reindex(table.index) - 1
+    table["rss_change"] = table["peak_rss_mb"] / prev["peak_rss_mb"].reindex(table.index) - 1
+    return table
+
+def record(run):
+    # append to the history CSV; returns the comparison with earlier runs
+    os.makedirs(os.path.dirname(HISTORY_CSV), exist_ok=True)
+    history = pd.read_csv(HISTORY_CSV) if os.path.exists(HISTORY_CSV) else run.iloc[:0]
+    table = compare(run, history)
+    pd.concat([history, run], ignore_index=True).to_csv(HISTORY_CSV, index=False)
+    return table
+
+def main():
+    if sys.argv[1:2] == ["--run-case"]:
+        run_case(sys.argv[2], sys.argv[3])
+        return
+    parser = argparse.ArgumentParser(description="Time every script on synthetic Divvy data.")
+    parser.add_argument("scale", help=f"{', '.join(synthetic_data.SCALES)} or a row count")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), help="subset of cases (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEATS, help="runs per case; the best is kept")
+    args = parser.parse_args()
+    with trace_run("benchmarks"):
+        run = run_suite(args.scale.lower(), args.cases, args.repeat)
+    table = record(run)
+    with pd.option_context("display.float_format", "{:.3f}".format, "display.width", 120):
+        print(table.to_string())
+    print(f"📝 Appended {len(run)} results to {HISTORY_CSV}")
+
+if __name__ == "__main__":
+    main()
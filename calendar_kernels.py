@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from timestamps import days_from_civil
+from partials import bincount_partial, merge_partials
+
+# Calendar grids straight from integer timestamps.
+# Everything works on int64 hours since the epoch, the key of the hourly cube
+# (cube["start_hour"] + i) and of file_partials. calendar_codes() turns them
+# into hour, weekday, day, month, year, ISO week, day of year and day type
+# (workday / weekend / US federal holiday) with integer arithmetic only.
+# grid() then sums any one or two of those codes with np.bincount over a
+# dense hourly count array. A dense array holds every hour of its span,
+# including hours without rides, so each cell's mean is its total divided by
+# the number of distinct hours that fall in it, which is what a groupby
+# mean over hourly counts gives, without a resample or pivot.
+#
+# Trip timestamps (any unit) can be folded into such a dense array in one
+# streaming pass with hour_counts(); the cube already is one.
+
+UNITS = {"ns": 3_600_000_000_000, "us": 3_600_000_000, "ms": 3_600_000, "s": 3600, "h": 1}
+
+DAY_TYPES = ["workday", "weekend", "holiday"]
+
+# axis -> (first code, number of codes, labels or None); "year" and
+# "iso_year" are sized from the data
+AXES = {
+    "hour":     (0, 24, None),
+    "dow":      (0, 7, None),     # 0 = Monday
+    "day":      (1, 31, None),
+    "month":    (1, 12, None),
+    "week":     (1, 53, None),    # ISO week, paired with iso_year
+    "doy":      (1, 366, None),
+    "day_type": (0, 3, DAY_TYPES),
+}
+
+# US federal holidays (observed on the nearest weekday when they fall on a
+# weekend): (name, month, fixed day or (weekday, nth; -1 = last), first year)
+HOLIDAYS = [
+    ("New Year's Day",   1, 1,        None),
+    ("Martin Luther King Jr. Day", 1, (0, 3), None),
+    ("Presidents' Day",  2, (0, 3),   None),
+    ("Memorial Day",     5, (0, -1),  None),
+    ("Juneteenth",       6, 19,       2021),
+    ("Independence Day", 7, 4,        None),
+    ("Labor Day",        9, (0, 1),   None),
+    ("Columbus Day",     10, (0, 2),  None),
+    ("Veterans Day",     11, 11,      None),
+    ("Thanksgiving",     11, (3, 4),  None),
+    ("Christmas Day",    12, 25,      None),
+]
+
+def to_hours(values, unit="ns"):
+    # int64 hours since the epoch from datetime64 values or integer epoch
+    # timestamps in unit ("ns", "us", "ms", "s" or "h"); floors like pandas
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[h]").astype(np.int64)
+    return values.astype(np.int64) // UNITS[unit]
+
+def civil_from_days(days):
+    # days since 1970-01-01 -> (year, month, day); inverse of days_from_civil
+    z = np.asarray(days, dtype=np.int64) + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = np.where(mp < 10, mp + 3, mp - 9)
+    year = yoe + era * 400 + (month <= 2)
+    return year, month, day
+
+def weekday(days):
+    return (np.asarray(days, dtype=np.int64) + 3) % 7   # 1970-01-01 was a Thursday
+
+def nth_weekday(year, month, dow, n):
+    # day number of the nth (n = -1: last) given weekday of the month
+    if n > 0:
+        first = days_from_civil(year, month, 1)
+        return first + (dow - weekday(first)) % 7 + 7 * (n - 1)
+    last = days_from_civil(year + (month == 12), month % 12 + 1, 1) - 1
+    return last - (weekday(last) - dow) % 7
+
+def holiday_days(first_year, last_year):
+    # sorted day numbers of the observed holidays in [first_year, last_year]
+    days = []
+    for year in range(first_year - 1, last_year + 2):   # New Year can be observed on Dec 31
+        for _, month, rule, since in HOLIDAYS:
+            if since is not None and year < since:
+                continue
+            if isinstance(rule, tuple):
+                days.append(int(nth_weekday(year, month, *rule)))
+            else:
+                d = int(days_from_civil(year, month, rule))
+                dow = int(weekday(d))
+                days.append(d - 1 if dow == 5 else d + 1 if dow == 6 else d)
+    return np.unique(days)
+
+def calendar_codes(hours):
+    # dict of int64 calendar codes for epoch hours
+    hours = np.asarray(hours, dtype=np.int64)
+    days = hours // 24
+    year, month, day = civil_from_days(days)
+    dow = weekday(days)
+    thursday = days - dow + 3                        # ISO weeks belong to their Thursday's year
+    iso_year = civil_from_days(thursday)[0]
+    week = (thursday - days_from_civil(iso_year, 1, 1)) // 7 + 1
+    doy = days - days_from_civil(year, 1, 1) + 1
+    if len(days):
+        holiday = np.isin(days, holiday_days(int(year.min()), int(year.max())))
+    else:
+        holiday = np.zeros(0, dtype=bool)
+    day_type = np.where(holiday, 2, np.where(dow >= 5, 1, 0))
+    return {"hour": hours % 24, "dow": dow, "day": day, "month": month, "year": year,
+            "week": week, "iso_year": iso_year, "doy": doy, "day_type": day_type}
+
+def axis(name, codes):
+    # (first code, size, labels) of one grid axis
+    if name in ("year", "iso_year"):
+        c = codes[name]
+        first = int(c.min()) if len(c) else 0
+        size = int(c.max()) - first + 1 if len(c) else 0
+        return first, size, list(range(first, first + size))
+    first, size, labels = AXES[name]
+    return first, size, labels or list(range(first, first + size))
+
+def grid(start_hour, counts, keys, mask=None, codes=None):
+    # totals, distinct hours and means of dense hourly counts over one or two
+    # calendar codes; counts[i] belongs to hour start_hour + i. mask limits
+    # the hours used; codes can be passed in to share one calendar_codes()
+    # between several grids.
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    counts = np.asarray(counts)
+    if codes is None:
+        codes = calendar_codes(np.arange(start_hour, start_hour + len(counts)))
+    axes = [axis(k, codes) for k in keys]
+    shape = tuple(size for _, size, _ in axes)
+    cell = np.zeros(len(counts), dtype=np.int64)
+    for k, (first, size, _) in zip(keys, axes):
+        cell = cell * size + (codes[k] - first)
+    weights = counts.astype(np.float64)
+    if mask is not None:
+        cell, weights = cell[mask], weights[mask]
+    n = int(np.prod(shape))
+    total = np.bincount(cell, weights=weights, minlength=n).reshape(shape)
+    hours = np.bincount(cell, minlength=n).reshape(shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(hours > 0, total / hours, np.nan)
+    return {"keys": keys, "labels": [labels for _, _, labels in axes],
+            "total": total, "hours": hours, "mean": mean}
+
+def grid_frame(g, stat="mean"):
+    # a grid's stat as a Series (one key) or DataFrame (rows x columns)
+    index = [pd.Index(labels, name=key) for key, labels in zip(g["keys"], g["labels"])]
+    if len(index) == 1:
+        return pd.Series(g[stat], index=index[0], name=stat)
+    return pd.DataFrame(g[stat], index=index[0], columns=index[1])
+
+def hour_counts(chunks, unit="ns"):
+    # one pass over chunks of trip timestamps -> (start_hour, dense hourly counts)
+    partial = (0, np.zeros(0, dtype=np.int32))
+    for values in chunks:
+        values = np.asarray(values)
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = values[~np.isnat(values)]
+        partial = merge_partials([partial, bincount_partial(to_hours(values, unit))])
+    return partial
@@ -0,0 +1,117 @@
+import os
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from trip_store import DATA_DIR
+from parallel import WORKERS
+
+# Parallel fit + cross-validation for several models at once.
+# The final fit of every model and each of its CV folds are independent jobs
+# scheduled on one process pool of CV_WORKERS processes, largest training
+# sets first. The feature matrix and target are written once to SHARED_DIR
+# as .npy files and memory-mapped read-only by every worker; fold indices are
+# computed once in the parent and, being contiguous for TimeSeriesSplit, sent
+# as slices, so a job's training data is a view rather than a copy. Every
+# job reports its wall-clock time.
+
+CV_WORKERS = int(os.environ.get("DIVVY_CV_WORKERS", WORKERS))   # core budget
+SHARED_DIR = os.path.join(DATA_DIR, "cv_shared")
+
+SHARED = {}   # per-process: memory-mapped X, y and the column names
+
+def as_slice(idx):
+    # contiguous index arrays become slices (views instead of fancy-index copies)
+    idx = np.asarray(idx)
+    if len(idx) and idx[-1] - idx[0] == len(idx) - 1 and (np.diff(idx) == 1).all():
+        return slice(int(idx[0]), int(idx[-1]) + 1)
+    return idx
+
+def rows(idx):
+    return idx.stop - idx.start if isinstance(idx, slice) else len(idx)
+
+def share(X, y, root=SHARED_DIR):
+    # write X and y once for all workers; returns the folder holding them
+    os.makedirs(root, exist_ok=True)
+    folder = tempfile.mkdtemp(dir=root)
+    np.save(os.path.join(folder, "X.npy"), np.ascontiguousarray(X.to_numpy(dtype=np.float64)))
+    np.save(os.path.join(folder, "y.npy"), np.asarray(y, dtype=np.float64))
+    return folder
+
+def attach(folder, columns):
+    # pool initializer: map the shared arrays once per worker process
+    SHARED["X"] = np.load(os.path.join(folder, "X.npy"), mmap_mode="r")
+    SHARED["y"] = np.load(os.path.join(folder, "y.npy"), mmap_mode="r")
+    SHARED["columns"] = columns
+
+def run_job(job):
+    # fit on job["train"]; score on job["test"] for a fold, return the model otherwise
+    X, y = SHARED["X"], SHARED["y"]
+    t0 = time.perf_counter()
+    model = clone(job["estimator"])
+    model.fit(pd.DataFrame(X[job["train"]], columns=SHARED["columns"], copy=False), y[job["train"]])
+    result = {"model": job["model"], "fold": job["fold"], "train_rows": rows(job["train"])}
+    if job["test"] is None:
+        result["estimator"] = model
+    else:
+        X_te = pd.DataFrame(X[job["test"]], columns=SHARED["columns"], copy=False)
+        result["r2"] = r2_score(y[job["test"]], model.predict(X_te))
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+def make_jobs(models, split, folds):
+    jobs = []
+    for name, estimator in models.items():
+        jobs.append({"model": name, "estimator": estimator, "fold": None,
+                     "train": slice(0, split), "test": None})
+        for k, (train, test) in enumerate(folds):
+            jobs.append({"model": name, "estimator": estimator, "fold": k,
+                         "train": as_slice(train), "test": as_slice(test)})
+    # longest first so the pool is not left waiting on one big fit at the end
+    return sorted(jobs, key=lambda j: -rows(j["train"]))
+
+def fit_and_score(models, X, y, split, cv, workers=None):
+    # fit every model on the first split rows and cross-validate it with cv;
+    # returns ({name: (fitted model, cv r2 array)}, per-job timings frame)
+    if not models:
+        return {}, pd.DataFrame(columns=["model", "fold", "train_rows", "seconds"])
+    folds = list(cv.split(X))
+    jobs = make_jobs(models, split, folds)
+    workers = CV_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(jobs)))
+    folder = share(X, y)
+    try:
+        if workers == 1:
+            attach(folder, list(X.columns))
+            results = [run_job(j) for j in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attach,
+                                     initargs=(folder, list(X.columns))) as pool:
+                results = [f.result() for f in as_completed([pool.submit(run_job, j) for j in jobs])]
+    finally:
+        SHARED.clear()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    fitted = {}
+    for name in models:
+        final = next(r for r in results if r["model"] == name and r["fold"] is None)
+        scores = sorted((r["fold"], r["r2"]) for r in results if r["model"] == name and r["fold"] is not None)
+        fitted[name] = (final["estimator"], np.array([s for _, s in scores]))
+    timings = pd.DataFrame([{k: r[k] for k in ("model", "fold", "train_rows", "seconds")}
+                            for r in results])
+    timings["fold"] = timings["fold"].map(lambda k: "fit" if pd.isna(k) else f"cv{int(k)}")
+    timings = timings.sort_values(["model", "fold"], ignore_index=True)
+    return fitted, timings
+
+def report_timings(timings, wall):
+    # per-model totals next to the elapsed time of the whole pool
+    for name, group in timings.groupby("model", sort=False):
+        folds = ", ".join(f"{f}={s:.2f}s" for f, s in zip(group["fold"], group["seconds"]))
+        print(f"⏱️ {name}: {group['seconds'].sum():.2f}s of work ({folds})")
+    busy = timings["seconds"].sum()
+    print(f"⏱️ {len(timings)} jobs, {busy:.2f}s of work in {wall:.2f}s wall "
+          f"({busy / wall if wall else 0:.1f}x)")
@@ -1,12 +1,16 @@
 import os
-import glob
+import numpy as np
 import pandas as pd
+from trip_store import ingest, iter_chunks, list_partitions
+from ride_counts import to_series
+from partials import bincount_partial, merge_partials
+from parallel import map_reduce
+from instrumentation import stage, instrumented
 
 # Summary script for Divvy bike-sharing dataset with outlier removal by ride duration and daily ride count
 # Computes basic dataset metrics without heavy resampling
 
 OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'output'))
-TRIP_ROOT  = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'bikes_raw'))
 
 # Duration thresholds in minutes
 MIN_DURATION = 1      # minimum 1 minute
@@ -15,37 +19,42 @@ MAX_DURATION = 1440   # maximum 24 hours
 # Outlier removal for daily ride counts using IQR
 IQR_FACTOR = 1.5
 
+# Streaming: rows read per chunk. Only a per-day counter is kept between
+# chunks, so peak memory is about CHUNK_SIZE rows per worker whatever the
+# dataset size. None reads each partition whole.
+CHUNK_SIZE = 250_000
+
+def daily_chunk_counts(df):
+    # duration-filtered (first day since epoch, rides per day) for one chunk
+    df = df.dropna(subset=['started_at', 'ended_at'])
+    duration_min = (df['ended_at'] - df['started_at']).dt.total_seconds() / 60.0
+    keep = (duration_min >= MIN_DURATION) & (duration_min <= MAX_DURATION) & df['ride_id'].notna()
+    days = df.loc[keep, 'started_at'].values.astype('datetime64[D]').astype(np.int64)
+    return bincount_partial(days)
+
+def daily_partial(path):
+    # running per-day counter over one partition
+    columns = ['ride_id', 'started_at', 'ended_at']
+    if CHUNK_SIZE is None:
+        return daily_chunk_counts(pd.read_parquet(path, columns=columns))
+    counts = (0, np.zeros(0, dtype=np.int32))
+    for chunk in iter_chunks(path, columns, CHUNK_SIZE):
+        counts = merge_partials([counts, daily_chunk_counts(chunk)])
+    return counts
+
+@instrumented("dataset_summary")
 def main():
     import datetime
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # Gather all trip data files
-    trip_files = []
-    for root, _, files in os.walk(TRIP_ROOT):
-        for fn in files:
-            if fn.endswith('-divvy-tripdata.csv') and not fn.startswith('._'):
-                trip_files.append(os.path.join(root, fn))
-
-    all_dfs = []
-    # Load and filter by duration
-    for fp in trip_files:
-        df = pd.read_csv(
-            fp,
-            usecols=['ride_id', 'started_at', 'ended_at'],
-            parse_dates=['started_at', 'ended_at'],
-            infer_datetime_format=True
-        )
-        df = df.dropna(subset=['started_at', 'ended_at'])
-        df['duration_min'] = (df['ended_at'] - df['started_at']).dt.total_seconds() / 60.0
-        df = df[(df['duration_min'] >= MIN_DURATION) & (df['duration_min'] <= MAX_DURATION)]
-        all_dfs.append(df[['ride_id','started_at']])
-
-    # Concatenate all filtered rides
-    master = pd.concat(all_dfs, ignore_index=True)
-    master.set_index('started_at', inplace=True)
+    trip_files = ingest()
 
-    # Compute daily ride counts
-    daily_counts = master['ride_id'].resample('D').count()
+    # Filter by duration and count rides per day, one partition per worker
+    with stage("daily counts by duration filter") as st:
+        start_day, counts = map_reduce(daily_partial, list_partitions(), merge_partials)
+        daily_counts = to_series(start_day, counts, 'D')
+        st.rows_out = int(counts.sum())
 
     # Remove daily count outliers via IQR
     q1 = daily_counts.quantile(0.25)
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from trip_store import DATA_DIR, ingest
+from ride_counts import store_signature, load_hourly
+import weather
+from instrumentation import stage, traced, instrumented
+
+# Precomputed hourly model features shared by training, CV and serving.
+# One float32 row per hour of the dense ride-count cube (so a shift of k rows
+# is exactly k hours back), with weather reindexed onto it:
+#   - weather: temp, precip (clipped at 0), humidity, wind, pressure
+#   - calendar: hour, dayofweek, month, season (0 winter .. 3 fall)
+#   - lags: rides 1, 24 and 168 hours earlier
+#   - rolling weather: precip summed over the last 3/6/24 h, temperature
+#     averaged over the last 6/24 h (both including the current hour)
+# The frame is saved as parquet under CACHE_DIR and rebuilt only when the
+# ingested trips, the weather sources or the feature definitions change.
+
+CACHE_DIR     = os.path.join(DATA_DIR, "features")
+FEATURE_PATH  = os.path.join(CACHE_DIR, "hourly_features.parquet")
+META_PATH     = os.path.join(CACHE_DIR, "hourly_features.json")
+FEATURE_VERSION = 1        # bump when compute_features changes
+
+LAGS          = [1, 24, 168]
+PRECIP_WINDOWS = [3, 6, 24]
+TEMP_WINDOWS  = [6, 24]
+
+SEASONS = ["winter", "spring", "summer", "fall"]
+SEASON_OF_MONTH = np.array([-1, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)   # index = month
+
+WEATHER_FEATURES  = ["temp", "precip", "humidity", "wind", "pressure"]
+CALENDAR_FEATURES = ["hour", "dayofweek", "month", "season"]
+LAG_FEATURES      = [f"rides_lag_{k}" for k in LAGS]
+ROLLING_FEATURES  = ([f"precip_{w}h" for w in PRECIP_WINDOWS]
+                     + [f"temp_mean_{w}h" for w in TEMP_WINDOWS])
+
+def season_names(months):
+    # month numbers -> "winter"/"spring"/... by array lookup
+    return np.array(SEASONS)[SEASON_OF_MONTH[np.asarray(months)]]
+
+def compute_features(hourly, wdf):
+    # hourly: dense ride_count Series; wdf: weather frame from weather.load_weather
+    idx = hourly.index
+    w = wdf.reindex(idx)
+    rides = hourly.astype(np.float32)
+    precip = w["PRCP"].clip(lower=0)
+    temp = w["TEMP"]
+    cols = {
+        "rides": rides,
+        "temp": temp,
+        "precip": precip,
+        "humidity": w["HMDT"],
+        "wind": w["WND_SPD"],
+        "pressure": w["ATM_PRESS"],
+        "hour": idx.hour,
+        "dayofweek": idx.dayofweek,
+        "month": idx.month,
+        "season": SEASON_OF_MONTH[idx.month],
+    }
+    for k in LAGS:
+        cols[f"rides_lag_{k}"] = rides.shift(k)
+    for win in PRECIP_WINDOWS:
+        cols[f"precip_{win}h"] = precip.rolling(win, min_periods=1).sum()
+    for win in TEMP_WINDOWS:
+        cols[f"temp_mean_{win}h"] = temp.rolling(win, min_periods=1).mean()
+    return pd.DataFrame(cols, index=idx).astype(np.float32)
+
+def cache_key():
+    h = hashlib.sha256(f"{FEATURE_VERSION}|{LAGS}|{PRECIP_WINDOWS}|{TEMP_WINDOWS}".encode())
+    h.update("\n".join(store_signature()).encode())
+    h.update(json.dumps(list(weather.source_state())).encode())
+    return h.hexdigest()
+
+def read_meta():
+    if not os.path.exists(META_PATH):
+        return None
+    with open(META_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_store(key):
+    print("⚙️ Building feature store…")
+    hourly, wdf = load_hourly(), weather.load_weather()
+    with stage("compute features", rows_in=len(hourly)) as st:
+        feats = compute_features(hourly, wdf)
+        st.rows_out = len(feats)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = FEATURE_PATH + ".tmp"
+    feats.to_parquet(tmp, compression="zstd")
+    os.replace(tmp, FEATURE_PATH)
+    with open(META_PATH, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "rows": len(feats), "columns": list(feats.columns)}, f, indent=1)
+    return feats
+
+@traced("load features")
+def load_features(columns=None):
+    # cached hourly feature frame (float32, DatetimeIndex), rebuilt if stale
+    ingest()
+    key = cache_key()
+    meta = read_meta()
+    if os.path.exists(FEATURE_PATH) and meta and meta["key"] == key:
+        return pd.read_parquet(FEATURE_PATH, columns=columns)
+    feats = build_store(key)
+    return feats if columns is None else feats[columns]
+
+def read_features(columns=None):
+    # the last built store as is, without ingesting or rebuilding it (for
+    # serving nodes that have the store but not the raw trips and weather)
+    if not os.path.exists(FEATURE_PATH):
+        raise FileNotFoundError(f"no feature store at {FEATURE_PATH}; run feature_store.py first")
+    return pd.read_parquet(FEATURE_PATH, columns=columns)
+
+def rows_at(feats, times, columns):
+    # feature rows for the given timestamps (floored to the hour); NaN where unknown
+    return feats.reindex(pd.DatetimeIndex(pd.to_datetime(times)).floor("h"))[columns]
+
+@instrumented("feature_store")
+def main():
+    feats = load_features()
+    print(f"✅ Feature store at {FEATURE_PATH}: {len(feats)} hours x {feats.shape[1]} columns, "
+          f"{feats.memory_usage(index=False).sum() / 1e6:.1f} MB float32")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.metrics import r2_score, mean_absolute_error
+from feature_store import load_features
+from model_registry import data_fingerprint, latest_model, load_model, save_model
+import ride_predictor_app as app
+from instrumentation import stage, instrumented
+
+# Monthly refresh of the serving models without refitting the whole history.
+# The newest registry version of each model that carries "trained_until" is
+# the live model. Only rows after that timestamp are touched:
+#   - drift check: the live model's MAE on the new rows against its
+#     out-of-sample MAE at the last full retrain (a model fitted without the
+#     final HOLDOUT_DAYS, scored on them), and the share of new rows outside
+#     the feature ranges it was trained on
+#   - RandomForest: warm start, ADD_TREES new trees grown on the new rows
+#   - GradientBoosting: warm start, ADD_STAGES new boosting stages fitted to
+#     the live model's residuals on the new rows
+#   - LinearRegression has no partial_fit; a full fit is milliseconds, so it
+#     is always refitted on the whole window
+# Drift, a missing live model, a live model trained on other features
+# (DIVVY_FEATURE_SET changed) or an ensemble grown past MAX_ESTIMATORS
+# triggers a full retrain of that model on everything. Each update is saved
+# as a new registry version, so prediction_server.py picks it up on restart.
+
+WINDOW_END       = None    # last date to train on; None = everything ingested
+ADD_TREES        = 20
+ADD_STAGES       = 20
+MAX_ESTIMATORS   = 400     # retrain from scratch beyond this many trees/stages
+HOLDOUT_DAYS     = 28      # held out at full retrain to measure the reference MAE
+DRIFT_MAE_RATIO  = 1.5     # new-row MAE above this multiple of the reference is drift
+MAX_OUT_OF_RANGE = 0.05    # share of new rows outside training feature ranges
+DRIFT_FEATURES   = ["temp", "precip", "humidity", "wind"]   # calendar features are always "new" at first
+FORCE_FULL       = False
+
+def feature_ranges(X):
+    return {c: [float(X[c].min()), float(X[c].max())] for c in DRIFT_FEATURES}
+
+def out_of_range(X, ranges):
+    # share of rows with any feature outside the recorded [min, max]
+    outside = np.zeros(len(X), dtype=bool)
+    for c, (lo, hi) in ranges.items():
+        outside |= (X[c] < lo).to_numpy() | (X[c] > hi).to_numpy()
+    return float(outside.mean()) if len(X) else 0.0
+
+def drift_check(model, meta, X_new, y_new):
+    # (reason for a full retrain or None, new-row metrics)
+    pred = np.clip(model.predict(X_new), 0, None)
+    mae = mean_absolute_error(y_new, pred)
+    ref = meta["reference_mae"]
+    check = {"new_rows_mae": mae, "reference_mae": ref,
+             "out_of_range": out_of_range(X_new, meta["feature_ranges"])}
+    if ref is not None and mae > DRIFT_MAE_RATIO * ref:
+        return f"MAE {mae:.2f} > {DRIFT_MAE_RATIO} x {ref:.2f}", check
+    if check["out_of_range"] > MAX_OUT_OF_RANGE:
+        return f"{check['out_of_range']:.0%} of new rows outside the training ranges", check
+    return None, check
+
+def grow(model, name, X_new, y_new):
+    # add estimators fitted on the new rows; returns why it couldn't, else None
+    step = {"RandomForest": ADD_TREES, "GradientBoosting": ADD_STAGES}.get(name)
+    if step is None:
+        return "no incremental update for this model"
+    if model.n_estimators + step > MAX_ESTIMATORS:
+        return f"more than {MAX_ESTIMATORS} estimators"
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + step)
+    model.fit(X_new, y_new)
+    return None
+
+def reference_mae(name, df):
+    # out-of-sample MAE of a model fitted without the last HOLDOUT_DAYS
+    held = df.index > df.index.max() - pd.Timedelta(days=HOLDOUT_DAYS)
+    if held.all() or not held.any():
+        return None
+    model = app.make_models()[name].fit(df.loc[~held, app.FEATURES], df.loc[~held, "rides"])
+    pred = np.clip(model.predict(df.loc[held, app.FEATURES]), 0, None)
+    return mean_absolute_error(df.loc[held, "rides"], pred)
+
+def live_model(name):
+    # newest version that was trained for serving (has trained_until); later
+    # evaluation versions from ride_predictor_app.py are skipped
+    return latest_model(name, require="trained_until")
+
+def update_model(name, df):
+    X, y = df[app.FEATURES], df["rides"]
+    meta = None if FORCE_FULL else live_model(name)
+    same_features = meta is not None and meta["features"] == app.FEATURES
+    new = df.index > pd.Timestamp(meta["trained_until"]) if meta else np.ones(len(df), dtype=bool)
+    if same_features and not new.any():
+        print(f"♻️ {name} v{meta['version']:04d} is up to date ({meta['trained_until']})")
+        return meta
+    X_new, y_new = X[new], y[new]
+
+    t0 = time.perf_counter()
+    reason = "forced" if FORCE_FULL else "no live model"
+    check = {}
+    if meta is not None and not same_features:
+        reason = "features changed"   # e.g. DIVVY_FEATURE_SET; the live model can't score X
+    elif meta is not None:
+        model = load_model(meta, mmap=False)   # warm start appends to the model's arrays
+        reason, check = drift_check(model, meta, X_new, y_new)
+        reason = reason or grow(model, name, X_new, y_new)
+    mode = "incremental" if reason is None else "full"
+    if mode == "full":
+        model = app.make_models()[name].fit(X, y)
+        reference = reference_mae(name, df)
+    else:
+        reference = meta["reference_mae"]
+    seconds = time.perf_counter() - t0
+
+    # post-update fit quality on the rows just learned (all rows for a full fit)
+    X_fit, y_fit = (X_new, y_new) if mode == "incremental" else (X, y)
+    pred = np.clip(model.predict(X_fit), 0, None)
+    ranges = feature_ranges(X) if mode == "full" else {
+        c: [min(lo, float(X_new[c].min())), max(hi, float(X_new[c].max()))]
+        for c, (lo, hi) in meta["feature_ranges"].items()}
+    entry = save_model(name, model, {
+        "features": app.FEATURES,
+        "date_start": str(df.index.min().date()),
+        "date_end": str(df.index.max().date()),
+        "train_rows": int(len(df)),
+        "trained_until": str(df.index.max()),
+        "fingerprint": data_fingerprint(X, y),
+        "mode": mode,
+        "base_version": meta["version"] if meta else None,
+        "reason": reason,
+        "new_rows": int(new.sum()),
+        "update_seconds": seconds,
+        "n_estimators": getattr(model, "n_estimators", None),
+        "drift": check,
+        "feature_ranges": ranges,
+        "reference_mae": reference,
+        "metrics": {"r2": r2_score(y_fit, pred), "mse": float(np.mean((y_fit - pred) ** 2)),
+                    "mae": mean_absolute_error(y_fit, pred)},
+    })
+    how = f"full retrain ({reason})" if mode == "full" else f"+{int(new.sum())} rows incrementally"
+    print(f"✅ {name} v{entry['version']:04d}: {how} in {seconds:.2f}s")
+    return entry
+
+def refresh(df, names=None):
+    # bring every model's live version up to the end of df
+    entries = {}
+    for name in names or app.make_models():
+        with stage(f"update {name}", rows_in=len(df)):
+            entries[name] = update_model(name, df)
+    return entries
+
+@instrumented("incremental_training")
+def main():
+    global FORCE_FULL
+    parser = argparse.ArgumentParser(description="Update the serving models with newly ingested rides.")
+    parser.add_argument("--models", nargs="+", help="subset of the ride_predictor_app models")
+    parser.add_argument("--full", action="store_true", help="retrain from scratch")
+    args = parser.parse_args()
+    FORCE_FULL = FORCE_FULL or args.full
+    feats = load_features()
+    df = app.training_frame(feats, date_end=WINDOW_END or feats.index.max())
+    refresh(df, args.models)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import resource
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+
+# Named stages with wall time, CPU time, memory and row counts, written as one
+# JSON trace per run.
+#
+#   with trace_run("heatmap_analysis"):          # once, around a script's main()
+#       with stage("load weather") as st:
+#           wdf = load_weather()
+#           st.rows_out = len(wdf)
+#
+# Each stage records wall and CPU seconds (own process, plus pool workers that
+# finished inside it), RSS at entry, peak RSS while it ran and the difference,
+# and rows in/out when the code sets them. Stages nest; a stage outside any
+# run is timed and printed but not saved. The trace goes to
+# TRACE_DIR/<run>-<time>-<pid>.json when the run ends (also on errors).
+# Work done in a pool worker can run under trace_run(name, save=False) and
+# hand st.trace back to the parent, which adds it with merge_trace().
+# On Linux the kernel's peak-RSS counter is reset at each stage entry, so
+# every stage gets its own peak rather than the process-wide one.
+#
+# DIVVY_PROFILE_STAGE=<stage name> profiles that stage: with cProfile
+# (DIVVY_PROFILE_MODE=cprofile, a .prof plus a cumulative-time .txt next to
+# the trace) or a sampling thread (DIVVY_PROFILE_MODE=sample, folded stacks
+# for flamegraph.pl / speedscope, lower overhead on hot loops).
+
+TRACE_DIR       = os.environ.get("DIVVY_TRACE_DIR", os.path.join("..", "output", "traces"))
+TRACE           = os.environ.get("DIVVY_TRACE", "1") != "0"     # write JSON traces
+PRINT_STAGES    = os.environ.get("DIVVY_TRACE_QUIET") != "1"     # one ⏱️ line per stage
+PROFILE_STAGE   = os.environ.get("DIVVY_PROFILE_STAGE")
+PROFILE_MODE    = os.environ.get("DIVVY_PROFILE_MODE", "cprofile")   # "cprofile" or "sample"
+SAMPLE_INTERVAL = 0.005    # seconds between stack samples
+PROFILE_TOP     = 40       # functions listed in the cProfile text report
+
+STATE = {"pid": None, "run": None, "stack": [], "profiling": False}
+
+def read_status(field):
+    # VmRSS / VmHWM of this process in MB; None where /proc is unavailable
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def rss_mb():
+    rss = read_status("VmRSS")
+    return rss if rss is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def peak_mb():
+    hwm = read_status("VmHWM")
+    return hwm if hwm is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def reset_peak():
+    # restart the kernel's high-water mark at the current RSS (Linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def local_state():
+    # active run and open stages of this process; a forked worker starts
+    # clean instead of adding to the copy of its parent's run
+    if STATE["pid"] != os.getpid():
+        STATE.update(pid=os.getpid(), run=None, stack=[], profiling=False)
+    return STATE
+
+def current_run():
+    return local_state()["run"]
+
+class Stage:
+    def __init__(self, name, rows_in=None, rows_out=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.peak = 0.0
+        self.record = None
+
+    def start(self):
+        # fold the current peak into the open stages before it is reset
+        hwm = peak_mb()
+        for open_stage in local_state()["stack"]:
+            open_stage.peak = max(open_stage.peak, hwm)
+        reset_peak()
+        self.rss_start = rss_mb()
+        self.peak = self.rss_start
+        self.t0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+        self.child0 = children_cpu()
+
+    def stop(self, error=None):
+        wall = time.perf_counter() - self.t0
+        self.peak = max(self.peak, peak_mb())
+        parent = STATE["stack"][-1] if STATE["stack"] else None
+        if parent is not None:
+            parent.peak = max(parent.peak, self.peak)
+        run = current_run()
+        self.record = {
+            "name": self.name,
+            "path": "/".join([s.name for s in STATE["stack"]] + [self.name]),
+            "depth": len(STATE["stack"]),
+            "start_s": round(self.t0 - run["t0"], 6) if run else 0.0,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(time.process_time() - self.cpu0, 6),
+            "child_cpu_s": round(children_cpu() - self.child0, 6),
+            "rss_start_mb": round(self.rss_start, 1),
+            "peak_rss_mb": round(self.peak, 1),
+            "peak_rss_delta_mb": round(self.peak - self.rss_start, 1),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+        if error is not None:
+            self.record["error"] = repr(error)
+        if run is not None:
+            run["stages"].append(self.record)
+        if PRINT_STAGES:
+            rows = "" if self.rows_out is None else f", {self.rows_out:,} rows"
+            print(f"{'  ' * self.record['depth']}⏱️ {self.name}: {wall:.2f}s wall, "
+                  f"{self.record['cpu_s'] + self.record['child_cpu_s']:.2f}s CPU, "
+                  f"+{self.record['peak_rss_delta_mb']:.0f} MB peak{rows}")
+
+# --- profiling hooks ---------------------------------------------------------
+
+def profile_base(name):
+    run = current_run()
+    label = "".join(c if c.isalnum() else "_" for c in name)
+    base = run["path"][:-len(".json")] if run else os.path.join(TRACE_DIR, f"stage-{os.getpid()}")
+    return f"{base}-{label}"
+
+class StackSampler:
+    # samples the calling thread's stack every SAMPLE_INTERVAL seconds
+    def __init__(self):
+        self.target = threading.get_ident()
+        self.counts = Counter()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+
+    def loop(self):
+        while not self.done.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, base):
+        self.done.set()
+        self.thread.join()
+        path = base + ".folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
+
+class CProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self, base):
+        self.profile.disable()
+        self.profile.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(self.profile, stream=f).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return base + ".prof"
+
+def make_profiler(name):
+    if name != PROFILE_STAGE or local_state()["profiling"]:
+        return None
+    return StackSampler() if PROFILE_MODE == "sample" else CProfiler()
+
+# --- public API --------------------------------------------------------------
+
+@contextmanager
+def stage(name, rows_in=None, rows_out=None):
+    # time a block; set .rows_in / .rows_out on the yielded object
+    st = Stage(name, rows_in, rows_out)
+    profiler = make_profiler(name)
+    st.start()
+    STATE["stack"].append(st)
+    if profiler is not None:
+        STATE["profiling"] = True
+        profiler.start()
+    error = None
+    try:
+        yield st
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        profile_path = None
+        if profiler is not None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            profile_path = profiler.stop(profile_base(name))
+            STATE["profiling"] = False
+        STATE["stack"].pop()
+        st.stop(error)
+        if profile_path:
+            st.record["profile"] = profile_path
+            print(f"🔬 Profile of {name} saved to {profile_path}")
+
+def n_rows(obj):
+    shape = getattr(obj, "shape", None)
+    return int(shape[0]) if shape else None
+
+def traced(name=None):
+    # decorator form of stage(); rows_out is the result's length when it has a shape
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with stage(name or func.__name__) as st:
+                result = func(*args, **kwargs)
+                st.rows_out = n_rows(result)
+                return result
+        return inner
+    return wrap
+
+def write_trace(run):
+    os.makedirs(os.path.dirname(run["path"]), exist_ok=True)
+    trace = {k: v for k, v in run.items() if k not in ("t0", "path")}
+    tmp = run["path"] + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(trace, f, indent=1)
+    os.replace(tmp, run["path"])
+
+@contextmanager
+def trace_run(name, save=True):
+    # a script run: the outermost stage, saved as a JSON trace when it ends;
+    # inside another run it is just a nested stage (and st.trace is None)
+    if current_run() is not None:
+        with stage(name) as st:
+            st.trace = None
+            yield st
+        return
+    started = time.strftime("%Y%m%dT%H%M%S")
+    run = {"run": name, "started": started, "pid": os.getpid(), "argv": sys.argv,
+           "t0": time.perf_counter(), "t0_epoch": time.time(), "stages": [],
+           "path": os.path.abspath(os.path.join(TRACE_DIR, f"{name}-{started}-{os.getpid()}.json"))}
+    STATE["run"], STATE["stack"] = run, []
+    try:
+        with stage(name) as st:
+            st.trace = run
+            yield st
+    finally:
+        run["wall_s"] = round(time.perf_counter() - run["t0"], 6)
+        run["stages"].sort(key=lambda s: s["start_s"])
+        STATE["run"] = None
+        if TRACE and save:
+            write_trace(run)
+            if PRINT_STAGES:
+                print(f"🧾 Trace saved to {run['path']}")
+
+def merge_trace(trace):
+    # add the stages of a run traced in another process under the open stage
+    run = current_run()
+    if run is None or trace is None:
+        return
+    stack = local_state()["stack"]
+    prefix = "/".join(s.name for s in stack)
+    shift = trace["t0_epoch"] - run["t0_epoch"]
+    for record in trace["stages"]:
+        record = dict(record, pid=trace["pid"], depth=record["depth"] + len(stack),
+                      start_s=round(record["start_s"] + shift, 6))
+        record["path"] = f"{prefix}/{record['path']}" if prefix else record["path"]
+        run["stages"].append(record)
+
+def instrumented(name):
+    # decorator for a script's main(): runs it inside trace_run(name)
+    def wrap(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with trace_run(name):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
@@ -5,11 +5,19 @@ import numpy as np
 import folium
 from folium.plugins import HeatMap
 import branca.colormap as cm
+from branca.element import MacroElement
+from jinja2 import Template
+from trip_store import ingest, load_partials
+from spatial_grid import cell_centers, merge_cells
+from instrumentation import stage, traced, instrumented
 
 # Configuration
 OUTPUT_DIR = "../output"
-TRIP_ROOT  = "../data/bikes_raw"
 TOP_N      = 10
+HEATMAP_ZOOM  = 16        # origin-grid level feeding the density heatmap (see spatial_grid.ZOOM_LEVELS)
+GRADIENT_MODE = "layer"   # "layer": one canvas layer for all stations, "circles": one folium.Circle each
+
+HEX = np.array([f"{i:02x}" for i in range(256)])
 
 def create_colormap(vmin, vmax):
     return cm.LinearColormap(
@@ -17,76 +25,141 @@ def create_colormap(vmin, vmax):
         vmin=vmin, vmax=vmax, caption="Ride volume"
     )
 
+def colormap_hex(cmap, values):
+    # vectorized cmap(v) for a LinearColormap: interpolate each RGBA channel
+    # over cmap.index and format "#RRGGBBAA" the way branca does
+    index = np.asarray(cmap.index, dtype=float)
+    colors = np.asarray(cmap.colors, dtype=float)
+    values = np.asarray(values, dtype=float)
+    rgba = [(np.interp(values, index, colors[:, k]) * 255.9999).astype(int) for k in range(4)]
+    out = np.full(len(values), "#")
+    for channel in rgba:
+        out = np.char.add(out, HEX[channel])
+    return out
+
+class StationLayer(MacroElement):
+    # every station as a circle on one shared canvas renderer; positions,
+    # radii, colors and popup fields ship as compact columns, not per-object HTML
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function(d) {
+            var renderer = L.canvas();
+            var layer = L.layerGroup();
+            for (var i = 0; i < d.lat.length; i++) {
+                L.circle([d.lat[i], d.lng[i]], {
+                    renderer: renderer, radius: d.radius[i],
+                    color: d.color[i], fill: true, fillColor: d.color[i], fillOpacity: 0.6
+                }).bindPopup("Station " + d.station[i] + "<br>Total rides: " + d.count[i])
+                  .addTo(layer);
+            }
+            return layer;
+        })({{ this.data|tojson }});
+        {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, station_stats, cmap):
+        super().__init__()
+        self._name = "StationLayer"
+        counts = station_stats["count"].to_numpy()
+        self.data = {
+            "lat": np.round(station_stats["start_lat"].to_numpy(dtype=float), 6).tolist(),
+            "lng": np.round(station_stats["start_lng"].to_numpy(dtype=float), 6).tolist(),
+            "radius": np.round(10 + np.log1p(counts) * 5, 2).tolist(),
+            "color": colormap_hex(cmap, counts).tolist(),
+            "station": station_stats.index.astype(str).tolist(),
+            "count": counts.tolist(),
+        }
+
+@traced("aggregate station counts")
+def load_station_stats():
+    # merge the per-file station tables cached at ingest: counts add up and
+    # coordinate sums give each station's centroid
+    ingest()
+    keys = ["station_ids", "station_counts", "station_coord_n",
+            "station_lat_sum", "station_lng_sum"]
+    parts = list(load_partials(*keys))
+    table = pd.DataFrame({
+        "start_station_id": pd.Categorical(np.concatenate([p["station_ids"] for p in parts])),
+        "count": np.concatenate([p["station_counts"] for p in parts]),
+        "coord_n": np.concatenate([p["station_coord_n"] for p in parts]),
+        "lat_sum": np.concatenate([p["station_lat_sum"] for p in parts]),
+        "lng_sum": np.concatenate([p["station_lng_sum"] for p in parts]),
+    })
+    totals = table.groupby("start_station_id", observed=True).sum()
+    return pd.DataFrame({
+        "start_lat": (totals["lat_sum"] / totals["coord_n"]).astype("float32"),
+        "start_lng": (totals["lng_sum"] / totals["coord_n"]).astype("float32"),
+        "count": totals["count"],
+    })
+
+@traced("origin density grid")
+def load_origin_density(zoom=HEATMAP_ZOOM):
+    # trip-origin counts per grid cell at this zoom, from the per-file grids
+    # cached at ingest (every trip, docked or not)
+    ingest()
+    keys, counts = merge_cells(
+        (p[f"grid_z{zoom}_keys"], p[f"grid_z{zoom}_counts"])
+        for p in load_partials(f"grid_z{zoom}_keys", f"grid_z{zoom}_counts")
+    )
+    lat, lng = cell_centers(keys, zoom)
+    return pd.DataFrame({"lat": lat, "lng": lng, "count": counts})
+
+@instrumented("maps_analysis")
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     print("📚 Loading station data…")
-    # scan for all trip CSVs
-    trip_files = []
-    for root, _, files in os.walk(TRIP_ROOT):
-        if "__MACOSX" in root:
-            continue
-        for fn in files:
-            if fn.startswith("._") or not fn.endswith("-divvy-tripdata.csv"):
-                continue
-            trip_files.append(os.path.join(root, fn))
-
-    # aggregate station counts
-    stats = []
-    for fp in trip_files:
-        df = pd.read_csv(
-            fp,
-            usecols=["start_station_id","start_lat","start_lng","ride_id"]
-        )
-        stats.append(df)
-    all_df = pd.concat(stats, ignore_index=True)
-    station_stats = (
-        all_df.groupby("start_station_id")
-              .agg(start_lat=("start_lat","first"),
-                   start_lng=("start_lng","first"),
-                   count=("ride_id","count"))
-    )
+    # aggregate station counts from the cached per-file station tables
+    station_stats = load_station_stats()
 
     # 1) Density heatmap
     print("🗺️ Building density heatmap…")
     m1 = folium.Map([41.8781,-87.6298], zoom_start=12)
-    HeatMap(
-        station_stats[["start_lat","start_lng","count"]].values,
-        radius=15, blur=25, max_zoom=18, min_opacity=0.4
-    ).add_to(m1)
-    # add legend
-    cmap = create_colormap(
-        station_stats["count"].min(),
-        station_stats["count"].max()
-    )
-    cmap.add_to(m1)
-    m1.save(os.path.join(OUTPUT_DIR, "station_density_heatmap.html"))
+    density = load_origin_density(HEATMAP_ZOOM)
+    with stage("density heatmap map", rows_in=len(density)):
+        HeatMap(
+            density[["lat","lng","count"]].values,
+            radius=15, blur=25, max_zoom=18, min_opacity=0.4
+        ).add_to(m1)
+        # add legend
+        cmap = create_colormap(
+            station_stats["count"].min(),
+            station_stats["count"].max()
+        )
+        cmap.add_to(m1)
+        m1.save(os.path.join(OUTPUT_DIR, "station_density_heatmap.html"))
 
     # 2) Gradient circles
     print("🗺️ Building gradient circle map…")
-    m2 = folium.Map([41.8781,-87.6298], zoom_start=12)
-    for sid, r in station_stats.iterrows():
-        color = cmap(r["count"])
-        folium.Circle(
-            [r["start_lat"], r["start_lng"]],
-            radius=10 + np.log1p(r["count"])*5,
-            color=color, fill=True, fill_color=color, fill_opacity=0.6,
-            popup=f"Station {sid}<br>Total rides: {r['count']}"
-        ).add_to(m2)
-    cmap.add_to(m2)
-    m2.save(os.path.join(OUTPUT_DIR, "station_gradient_map.html"))
+    with stage("gradient circle map", rows_in=len(station_stats)):
+        m2 = folium.Map([41.8781,-87.6298], zoom_start=12)
+        if GRADIENT_MODE == "layer":
+            StationLayer(station_stats, cmap).add_to(m2)
+        else:
+            for sid, r in station_stats.iterrows():
+                color = cmap(r["count"])
+                folium.Circle(
+                    [r["start_lat"], r["start_lng"]],
+                    radius=10 + np.log1p(r["count"])*5,
+                    color=color, fill=True, fill_color=color, fill_opacity=0.6,
+                    popup=f"Station {sid}<br>Total rides: {r['count']}"
+                ).add_to(m2)
+        cmap.add_to(m2)
+        m2.save(os.path.join(OUTPUT_DIR, "station_gradient_map.html"))
 
     # 3) Top‑10 markers
     print("🗺️ Building top‑10 station markers…")
-    top10 = station_stats.nlargest(TOP_N, "count")
-    m3 = folium.Map([41.8781,-87.6298], zoom_start=12)
-    for sid, r in top10.iterrows():
-        folium.Marker(
-            [r["start_lat"], r["start_lng"]],
-            popup=f"<b>Station {sid}</b><br>Total rides: {r['count']}",
-            icon=folium.Icon(color="blue", icon="bicycle", prefix="fa")
-        ).add_to(m3)
-    m3.save(os.path.join(OUTPUT_DIR, "top10_stations_map.html"))
+    with stage("top stations map", rows_in=len(station_stats)):
+        top10 = station_stats.nlargest(TOP_N, "count")
+        m3 = folium.Map([41.8781,-87.6298], zoom_start=12)
+        for sid, r in top10.iterrows():
+            folium.Marker(
+                [r["start_lat"], r["start_lng"]],
+                popup=f"<b>Station {sid}</b><br>Total rides: {r['count']}",
+                icon=folium.Icon(color="blue", icon="bicycle", prefix="fa")
+            ).add_to(m3)
+        m3.save(os.path.join(OUTPUT_DIR, "top10_stations_map.html"))
 
     print("✅ All maps saved in", OUTPUT_DIR)
 
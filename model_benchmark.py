@@ -0,0 +1,161 @@
+import time
+import pickle
+import shutil
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.linear_model import LinearRegression, Ridge, SGDRegressor
+from sklearn.ensemble import (RandomForestRegressor, GradientBoostingRegressor,
+                              HistGradientBoostingRegressor, ExtraTreesRegressor)
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.metrics import r2_score, mean_absolute_error
+from feature_store import load_features
+from cv_harness import SHARED, share, attach, as_slice
+import ride_predictor_app as app
+from instrumentation import stage, instrumented, rss_mb, peak_mb, reset_peak
+
+# Cost/accuracy benchmark of candidate regressors on the hourly feature matrix.
+# Each model runs alone in a freshly spawned process (so its peak RSS is its
+# own) that memory-maps the shared features, fits on the first 80%, and
+# records fit time, batch and single-row predict latency, peak RSS, pickled
+# size, test R²/MAE and TimeSeriesSplit CV R². Results go to
+# EVAL_DIR/model_benchmark.csv, which write_report adds to the HTML report.
+#
+#   python model_benchmark.py
+#   python model_benchmark.py --models HistGradientBoosting Ridge_svd
+
+BENCHMARK_CSV    = "model_benchmark.csv"   # under app.EVAL_DIR
+BENCHMARK_MODELS = None       # names from candidate_models(); None runs all
+CV_SPLITS        = 5
+SINGLE_ROW_CALLS = 200        # single-row predicts timed per model
+BATCH_REPEATS    = 5          # full test-set predicts timed per model
+
+def scaled(model):
+    return Pipeline([("scale", StandardScaler()), ("model", model)])
+
+def candidate_models():
+    return {
+        "LinearRegression": scaled(LinearRegression()),
+        "Ridge_cholesky": scaled(Ridge(alpha=1.0, solver="cholesky")),
+        "Ridge_svd": scaled(Ridge(alpha=1.0, solver="svd")),
+        "Ridge_lsqr": scaled(Ridge(alpha=1.0, solver="lsqr")),
+        "Ridge_sag": scaled(Ridge(alpha=1.0, solver="sag", random_state=42)),
+        "SGD": scaled(SGDRegressor(random_state=42)),
+        "HistGradientBoosting": HistGradientBoostingRegressor(max_iter=200, random_state=42),
+        "RandomForest": RandomForestRegressor(n_estimators=200, random_state=42),
+        "ExtraTrees": ExtraTreesRegressor(n_estimators=200, random_state=42),
+        "GradientBoosting": GradientBoostingRegressor(n_estimators=200, random_state=42),
+    }
+
+def frame(idx):
+    return pd.DataFrame(SHARED["X"][idx], columns=SHARED["columns"], copy=False)
+
+def bench_one(name, folder, columns, split, folds):
+    # runs in its own process: fit, time predictions, score, measure
+    attach(folder, columns)
+    model = candidate_models()[name]
+    y = SHARED["y"]
+    train, test = slice(0, split), slice(split, len(y))
+    X_tr, X_te = frame(train), frame(test)
+    # ru_maxrss carries over from the parent; the child's own high-water mark
+    # (VmHWM) starts at its exec, and is restarted here so the fit's peak is
+    # measured from the RSS just before it
+    start_peak = peak_mb()
+    reset_peak()
+    rss_before = rss_mb()
+
+    t0 = time.perf_counter()
+    model.fit(X_tr, y[train])
+    fit_s = time.perf_counter() - t0
+    fit_peak = peak_mb()
+
+    batch = []
+    for _ in range(BATCH_REPEATS):
+        t0 = time.perf_counter()
+        pred = model.predict(X_te)
+        batch.append(time.perf_counter() - t0)
+    rows = [X_te.iloc[[i % len(X_te)]] for i in range(SINGLE_ROW_CALLS)]
+    single = []
+    for row in rows:
+        t0 = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - t0)
+
+    pred = np.clip(pred, 0, None)
+    cv = []
+    for tr, te in folds:
+        fold_model = candidate_models()[name].fit(frame(tr), y[tr])
+        cv.append(r2_score(y[te], fold_model.predict(frame(te))))
+    return {
+        "model": name,
+        "r2": r2_score(y[test], pred),
+        "mae": mean_absolute_error(y[test], pred),
+        "cv_r2_mean": np.mean(cv),
+        "cv_r2_std": np.std(cv),
+        "fit_s": fit_s,
+        "predict_batch_ms": np.median(batch) * 1000,
+        "predict_batch_rows": len(X_te),
+        "predict_row_ms": np.median(single) * 1000,
+        "peak_rss_mb": max(start_peak, peak_mb()),
+        "fit_rss_mb": fit_peak - rss_before,
+        "model_kb": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+    }
+
+def pareto(table):
+    # models not beaten on both fit time and test R² by another model
+    best = []
+    for _, row in table.iterrows():
+        beaten = ((table["fit_s"] <= row["fit_s"]) & (table["r2"] >= row["r2"])
+                  & ((table["fit_s"] < row["fit_s"]) | (table["r2"] > row["r2"])))
+        best.append(not beaten.any())
+    return best
+
+def run(df, names=None):
+    # benchmark names (default BENCHMARK_MODELS, else every candidate) on the
+    # feature frame from build_features; returns and saves the table
+    names = names or BENCHMARK_MODELS or list(candidate_models())
+    unknown = set(names) - set(candidate_models())
+    if unknown:
+        raise ValueError(f"unknown models {sorted(unknown)}; choose from {list(candidate_models())}")
+    X, y = df[app.FEATURES], df["rides"]
+    split = int(len(df) * 0.8)
+    folds = [(as_slice(tr), as_slice(te)) for tr, te in TimeSeriesSplit(n_splits=CV_SPLITS).split(X)]
+    folder = share(X, y)
+    spawn = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for name in names:
+            # one fresh process per model, run one at a time so timings don't contend
+            with stage(f"benchmark: {name}", rows_in=len(X)), \
+                    ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                result = pool.submit(bench_one, name, folder, list(X.columns), split, folds).result()
+            print(f"📊 {name}: fit {result['fit_s']:.2f}s, row {result['predict_row_ms']:.2f}ms, "
+                  f"R2 {result['r2']:.4f}, {result['model_kb']:.0f} KiB")
+            results.append(result)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    table = pd.DataFrame(results)
+    table["frontier"] = pareto(table)
+    app.EVAL_DIR.mkdir(parents=True, exist_ok=True)
+    path = app.EVAL_DIR / BENCHMARK_CSV
+    table.to_csv(path, index=False)
+    print(f"✅ Benchmark saved to {path}")
+    return table
+
+@instrumented("model_benchmark")
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark regressors on the hourly ride features.")
+    parser.add_argument("--models", nargs="+", help=f"subset of {', '.join(candidate_models())}")
+    args = parser.parse_args()
+    df = app.training_frame(load_features())
+    run(df, args.models)
+    metrics_path = app.EVAL_DIR / "model_evaluation_metrics.csv"
+    if metrics_path.exists():   # refresh the report's benchmark table
+        app.write_report(pd.read_csv(metrics_path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import hashlib
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from trip_store import DATA_DIR
+from instrumentation import instrumented
+
+# Versioned on-disk registry of fitted models.
+# Every save creates REGISTRY_DIR/<name>/v0001/ with the model (joblib,
+# uncompressed so its arrays can be memory-mapped on load) and meta.json
+# (features, training window, metrics, model parameters and a fingerprint of
+# the training data). find_model returns the newest version fitted with the
+# same parameters on the same data, so callers can skip retraining.
+
+REGISTRY_DIR = os.path.join(DATA_DIR, "models")
+MODEL_FILE   = "model.joblib"
+META_FILE    = "meta.json"
+
+def data_fingerprint(X, y):
+    # content hash of the features, target and their timestamps
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    h.update(json.dumps(list(X.columns)).encode())
+    return h.hexdigest()
+
+def params_hash(model):
+    # hash of the estimator's (nested) parameters and the sklearn version
+    text = repr(sorted(model.get_params(deep=True).items(), key=lambda kv: kv[0]))
+    return hashlib.blake2b(f"{sklearn.__version__}|{text}".encode(), digest_size=16).hexdigest()
+
+def version_dirs(name):
+    root = os.path.join(REGISTRY_DIR, name)
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, d) for d in os.listdir(root)
+                  if d.startswith("v") and os.path.exists(os.path.join(root, d, META_FILE)))
+
+def read_meta(vdir):
+    with open(os.path.join(vdir, META_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def list_versions(name):
+    return [read_meta(v) for v in version_dirs(name)]
+
+def save_model(name, model, meta):
+    # store a new version; returns its meta (with version and path added)
+    existing = version_dirs(name)
+    version = int(os.path.basename(existing[-1])[1:]) + 1 if existing else 1
+    vdir = os.path.join(REGISTRY_DIR, name, f"v{version:04d}")
+    tmp = vdir + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+    joblib.dump(model, os.path.join(tmp, MODEL_FILE), compress=0)
+    meta = {
+        "name": name,
+        "version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sklearn": sklearn.__version__,
+        "params_hash": params_hash(model),
+        **meta,
+    }
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1, default=float)
+    os.replace(tmp, vdir)
+    return {**meta, "path": vdir}
+
+def find_model(name, model, **match):
+    # newest version with model's parameters and every match key equal
+    key = params_hash(model)
+    for vdir in reversed(version_dirs(name)):
+        meta = read_meta(vdir)
+        if meta["params_hash"] == key and all(meta.get(k) == v for k, v in match.items()):
+            return {**meta, "path": vdir}
+    return None
+
+def latest_model(name, require=None):
+    # newest version; with require, the newest whose meta has that key
+    for vdir in reversed(version_dirs(name)):
+        meta = read_meta(vdir)
+        if require is None or require in meta:
+            return {**meta, "path": vdir}
+    return None
+
+def serving_model(name):
+    # versions from incremental_training.py carry "trained_until"; evaluation
+    # runs of ride_predictor_app.py save newer versions fitted on part of the
+    # data, which are only served when no model was trained for serving
+    return latest_model(name, require="trained_until") or latest_model(name)
+
+def registered_names():
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(n for n in os.listdir(REGISTRY_DIR) if version_dirs(n))
+
+def load_model(meta, mmap=True):
+    # numpy arrays inside the model (tree nodes, coefficients) are mapped
+    # read-only from disk instead of copied
+    return joblib.load(os.path.join(meta["path"], MODEL_FILE), mmap_mode="r" if mmap else None)
+
+@instrumented("model_registry")
+def main():
+    names = registered_names()
+    if not names:
+        print("No models registered yet in", REGISTRY_DIR)
+        return
+    for name in names:
+        for meta in list_versions(name):
+            metrics = meta.get("metrics", {})
+            print(f"📦 {name} v{meta['version']:04d}  {meta['created']}  "
+                  f"{meta['date_start']}..{meta['date_end']}  "
+                  f"r2={metrics.get('r2', np.nan):.4f}  data={meta['fingerprint'][:8]}")
+
+if __name__ == "__main__":
+    main()
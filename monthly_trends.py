@@ -1,33 +1,27 @@
 import os
-import re
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from trip_store import TRIP_ROOT, ingest, list_partitions
+from ride_counts import load_cube
+from calendar_kernels import grid, grid_frame, calendar_codes
+from instrumentation import stage, instrumented
 
 # Configuration
 OUTPUT_DIR    = os.path.join("..", "output")
-TRIP_ROOT     = os.path.join("..", "data", "bikes_raw")
 GOV_TEMP_CSV  = os.path.join(
     "..", "data", "weather_raw",
     "chicago_monthly_avg_temp_weathergov.csv"
 )
 YEAR = "2023"
 
+@instrumented("monthly_trends")
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    # 1) Find every real 2023 *.csv, skip macOS metadata
-    pattern = re.compile(rf"{YEAR}\d{{2}}-divvy-tripdata\.csv$")
-    files = []
-    for root, _, fnames in os.walk(TRIP_ROOT):
-        # skip any __MACOSX directories
-        if "__MACOSX" in root:
-            continue
-        for fn in fnames:
-            if fn.startswith("._"):
-                continue
-            if pattern.match(fn):
-                files.append(os.path.join(root, fn))
-    files = sorted(files)
+    # 1) Find the 2023 month partitions in the trip store
+    ingest()
+    files = list_partitions(YEAR)
     if not files:
         print(f"❌  No files found matching {YEAR}*.csv under {TRIP_ROOT}")
         return
@@ -36,24 +30,24 @@ def main():
     for f in files:
         print("   ", os.path.basename(f))
 
-    # 2) Load & concat, count rides per hour
-    dfs = []
-    for fp in files:
-        df = pd.read_csv(fp,
-                         usecols=["ride_id", "started_at"],
-                         parse_dates=["started_at"])
-        dfs.append(df)
-    bikes = pd.concat(dfs, ignore_index=True)
-    bikes.dropna(subset=["started_at"], inplace=True)
-    bikes.set_index("started_at", inplace=True)
+    analyze(load_cube())
 
-    hourly = bikes["ride_id"].resample("h").count()
-    monthly_avg_rides = (
-        hourly
-        .groupby(hourly.index.month)
-        .mean()
-        .reindex(range(1,13), fill_value=0)
-    )
+def analyze(cube):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # 2) Mean rides per hour of each month of YEAR, from the cube's dense
+    #    hourly counts (hours without rides count as zeros). Like resampling
+    #    the year's rides, only the hours from its first to its last ride
+    #    count, not the whole of the first and last month.
+    start_hour, hourly = int(cube["start_hour"]), cube["hourly"]
+    with stage("monthly means", rows_in=len(hourly)):
+        codes = calendar_codes(np.arange(start_hour, start_hour + len(hourly)))
+        rode = np.flatnonzero((codes["year"] == int(YEAR)) & (hourly > 0))
+        span = np.zeros(len(hourly), dtype=bool)
+        if len(rode):
+            span[rode[0]:rode[-1] + 1] = True
+        monthly = grid(start_hour, hourly, "month", mask=span, codes=codes)
+        monthly_avg_rides = grid_frame(monthly).fillna(0)
 
     # 3) Load gov temps
     gov = pd.read_csv(GOV_TEMP_CSV)
@@ -72,40 +66,41 @@ def main():
     )
 
     # 4) Plot
-    plt.figure(figsize=(10,6))
-    ax = plt.gca()
-    ax.plot(
-        monthly_avg_rides.index,
-        monthly_avg_rides.values,
-        marker="o",
-        label=f"Avg Riders/hour {YEAR}"
-    )
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Avg Riders/hour")
+    with stage("plot monthly"):
+        plt.figure(figsize=(10,6))
+        ax = plt.gca()
+        ax.plot(
+            monthly_avg_rides.index,
+            monthly_avg_rides.values,
+            marker="o",
+            label=f"Avg Riders/hour {YEAR}"
+        )
+        ax.set_xlabel("Month")
+        ax.set_ylabel("Avg Riders/hour")
 
-    ax2 = ax.twinx()
-    ax2.plot(
-        gov_temps.index,
-        gov_temps.values,
-        marker="s",
-        linestyle="--",
-        color="tab:orange",
-        label="Gov Avg Temp (°C)"
-    )
-    ax2.set_ylabel("Avg Temp (°C)")
+        ax2 = ax.twinx()
+        ax2.plot(
+            gov_temps.index,
+            gov_temps.values,
+            marker="s",
+            linestyle="--",
+            color="tab:orange",
+            label="Gov Avg Temp (°C)"
+        )
+        ax2.set_ylabel("Avg Temp (°C)")
 
-    plt.title(f"Monthly Avg Riders {YEAR} vs Gov Avg Temp")
-    lines, labels = ax.get_legend_handles_labels()
-    l2, l2lab = ax2.get_legend_handles_labels()
-    ax.legend(lines + l2, labels + l2lab, loc="upper left")
+        plt.title(f"Monthly Avg Riders {YEAR} vs Gov Avg Temp")
+        lines, labels = ax.get_legend_handles_labels()
+        l2, l2lab = ax2.get_legend_handles_labels()
+        ax.legend(lines + l2, labels + l2lab, loc="upper left")
 
-    out_file = os.path.join(
-        OUTPUT_DIR,
-        f"monthly_riders_temp_comparison_{YEAR}.png"
-    )
-    plt.tight_layout()
-    plt.savefig(out_file)
-    plt.close()
+        out_file = os.path.join(
+            OUTPUT_DIR,
+            f"monthly_riders_temp_comparison_{YEAR}.png"
+        )
+        plt.tight_layout()
+        plt.savefig(out_file)
+        plt.close()
     print("✅  Saved plot to", out_file)
 
 
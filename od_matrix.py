@@ -0,0 +1,121 @@
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from trip_store import DATA_DIR, ingest, load_partials
+from ride_counts import store_signature
+from instrumentation import stage, instrumented
+
+# Origin-destination trip counts between stations by hour of week.
+# counts is a sparse (168 x n*n) CSR matrix: row dow*24 + hour, column
+# start_index*n + end_index over the sorted station list. Each trip file's
+# station-pair counts are computed once when it is ingested and cached with
+# its other partials (partials.od_table); the matrix is merged from those and
+# cached under OD_PATH, so a new month costs one file's parse, not a pass
+# over every partition. Time slices, top flows and marginals are answered
+# from it without touching the trips again.
+
+OUTPUT_DIR = "../output"
+OD_PATH    = os.path.join(DATA_DIR, "od_matrix.npz")
+SLOTS      = 7 * 24
+TOP_N      = 25
+
+def od_partials():
+    # (local station ids, slot/start/end keys, counts) cached per trip file
+    for p in load_partials("od_stations", "od_keys", "od_counts"):
+        yield p["od_stations"], p["od_keys"], p["od_counts"]
+
+def merge_od(partials):
+    # remap every partial onto the global station list and sum duplicates
+    stations = np.unique(np.concatenate([s for s, _, _ in partials])) if partials else np.zeros(0, str)
+    n = len(stations)
+    rows, cols, data = [], [], []
+    for local, keys, counts in partials:
+        m = len(local)
+        to_global = np.searchsorted(stations, local)
+        slot, rest = np.divmod(keys, m * m)
+        i, j = np.divmod(rest, m)
+        rows.append(slot)
+        cols.append(to_global[i] * n + to_global[j])
+        data.append(counts)
+    cat = lambda parts: np.concatenate(parts) if parts else np.zeros(0, np.int64)
+    counts = sp.coo_matrix((cat(data), (cat(rows), cat(cols))), shape=(SLOTS, n * n)).tocsr()
+    counts.sum_duplicates()
+    return {"stations": stations, "counts": counts}
+
+def build_od(signature=None):
+    print("⚙️ Building origin-destination matrix…")
+    if signature is None:
+        signature = store_signature()
+    with stage("merge station-pair partials") as st:
+        od = merge_od(list(od_partials()))
+        st.rows_out = od["counts"].nnz
+    c = od["counts"]
+    tmp = OD_PATH + ".tmp.npz"
+    np.savez(tmp, stations=od["stations"], data=c.data, indices=c.indices,
+             indptr=c.indptr, shape=np.array(c.shape), signature=signature)
+    os.replace(tmp, OD_PATH)
+    return od
+
+def load_od():
+    ingest()
+    signature = store_signature()
+    if os.path.exists(OD_PATH):
+        with np.load(OD_PATH) as z:
+            if np.array_equal(z["signature"], signature):
+                counts = sp.csr_matrix((z["data"], z["indices"], z["indptr"]),
+                                       shape=tuple(z["shape"]))
+                return {"stations": z["stations"], "counts": counts}
+    return build_od(signature)
+
+def time_slice(od, hours=None, days=None):
+    # (n x n) CSR start->end trip counts summed over the chosen hours of day
+    # (0-23) and days of week (0=Mon)
+    hours = range(24) if hours is None else hours
+    days = range(7) if days is None else days
+    slots = sorted(d * 24 + h for d in days for h in hours)
+    n = len(od["stations"])
+    sel = od["counts"][slots].tocoo()
+    i, j = np.divmod(sel.col, n)
+    return sp.coo_matrix((sel.data, (i, j)), shape=(n, n)).tocsr()
+
+def top_flows(od, n=None, hours=None, days=None):
+    # the n (default TOP_N) largest station-to-station flows in the slice
+    n = TOP_N if n is None else n
+    m = time_slice(od, hours, days).tocoo()
+    order = np.argsort(-m.data, kind="stable")[:n]
+    stations = od["stations"]
+    return pd.DataFrame({
+        "start_station_id": stations[m.row[order]],
+        "end_station_id": stations[m.col[order]],
+        "trips": m.data[order],
+    })
+
+def marginals(od, hours=None, days=None):
+    # departures (row sums) and arrivals (column sums) per station
+    m = time_slice(od, hours, days)
+    return pd.DataFrame({
+        "departures": np.asarray(m.sum(axis=1)).ravel(),
+        "arrivals": np.asarray(m.sum(axis=0)).ravel(),
+    }, index=pd.Index(od["stations"], name="station_id"))
+
+def hourly_profile(od):
+    # total trips per (day of week, hour of day)
+    totals = np.asarray(od["counts"].sum(axis=1)).ravel()
+    return pd.DataFrame(totals.reshape(7, 24), index=pd.RangeIndex(7, name="dayofweek"))
+
+@instrumented("od_matrix")
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    od = load_od()
+    print(f"📦 {len(od['stations'])} stations, {od['counts'].nnz} non-zero station pairs × hour slots")
+
+    with stage("top flows and marginals", rows_in=od["counts"].nnz):
+        top_flows(od).to_csv(os.path.join(OUTPUT_DIR, "od_top_flows.csv"), index=False)
+        top_flows(od, hours=range(7, 10), days=range(5)).to_csv(
+            os.path.join(OUTPUT_DIR, "od_top_flows_weekday_am_peak.csv"), index=False)
+        marginals(od).to_csv(os.path.join(OUTPUT_DIR, "od_station_marginals.csv"))
+    print("✅ Saved OD tables to", OUTPUT_DIR)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Process-pool map-reduce over trip files/partitions.
+# Each worker turns one file into a compact partial aggregate (count arrays,
+# small tables) rather than a DataFrame of trips; results come back in input
+# order so the reduce step is deterministic regardless of scheduling.
+
+WORKERS = int(os.environ.get("DIVVY_WORKERS", os.cpu_count() or 1))
+
+def map_files(func, paths, workers=None):
+    # func(path) for every path, results in the same order as paths
+    paths = list(paths)
+    workers = WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        return [func(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, paths))
+
+def map_reduce(func, paths, reduce, workers=None):
+    # fan sorted paths out to the pool, then fold the partials in path order
+    return reduce(map_files(func, sorted(paths), workers))
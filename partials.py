@@ -0,0 +1,97 @@
+import numpy as np
+from spatial_grid import grid_counts
+
+# Per-file partial aggregates.
+# Every partial is small and mergeable: dense count arrays are stored as
+# (first code, counts) pairs and folded with merge_partials, tables as
+# (keys, values) arrays.
+
+DURATION_MAX_MIN = 1440   # one-minute duration bins up to 24 h, plus under/overflow
+
+def bincount_partial(codes):
+    # (first code, dense int32 counts) for integer bucket codes
+    if len(codes) == 0:
+        return 0, np.zeros(0, dtype=np.int32)
+    c0 = int(codes.min())
+    return c0, np.bincount(codes - c0).astype(np.int32)
+
+def merge_partials(partials):
+    # sum (first code, counts) pairs into one dense range
+    partials = [(c0, c) for c0, c in partials if len(c)]
+    if not partials:
+        return 0, np.zeros(0, dtype=np.int32)
+    start = min(c0 for c0, _ in partials)
+    stop = max(c0 + len(c) for c0, c in partials)
+    merged = np.zeros(stop - start, dtype=np.int32)
+    for c0, c in partials:
+        merged[c0 - start:c0 - start + len(c)] += c
+    return start, merged
+
+def duration_histogram(started, ended):
+    # bin 0: negative durations, bin k+1: [k, k+1) minutes, last bin: >= 24 h
+    minutes = (ended - started).dt.total_seconds().dropna().to_numpy() / 60.0
+    idx = np.clip(np.floor(minutes), -1, DURATION_MAX_MIN).astype(np.int64) + 1
+    return np.bincount(idx, minlength=DURATION_MAX_MIN + 2).astype(np.int64)
+
+def station_table(station_ids, lat, lng):
+    # per start station: ride count plus coordinate sums for centroids,
+    # grouped on the categorical codes so memory scales with stations
+    sid = station_ids.astype("category")
+    codes = sid.cat.codes.to_numpy()
+    valid = codes >= 0
+    has_coord = valid & lat.notna().to_numpy() & lng.notna().to_numpy()
+    n = len(sid.cat.categories)
+    counts = np.bincount(codes[valid], minlength=n)
+    coord_n = np.bincount(codes[has_coord], minlength=n)
+    lat_sum = np.bincount(codes[has_coord], weights=lat.to_numpy()[has_coord], minlength=n)
+    lng_sum = np.bincount(codes[has_coord], weights=lng.to_numpy()[has_coord], minlength=n)
+    used = counts > 0
+    return {
+        "station_ids": sid.cat.categories.to_numpy(dtype=str)[used],
+        "station_counts": counts[used].astype(np.int64),
+        "station_coord_n": coord_n[used].astype(np.int64),
+        "station_lat_sum": lat_sum[used],
+        "station_lng_sum": lng_sum[used],
+    }
+
+def origin_grid(lat, lng):
+    # trip-origin counts per grid cell at every zoom level, including dockless
+    # trips without a start station
+    out = {}
+    for z, (keys, counts) in grid_counts(lat.to_numpy(), lng.to_numpy()).items():
+        out[f"grid_z{z}_keys"] = keys
+        out[f"grid_z{z}_counts"] = counts
+    return out
+
+def od_table(start_ids, end_ids, started):
+    # start -> end station trip counts by hour of week over this file's own
+    # sorted station list: key (slot * m + start) * m + end, slot dow*24+hour
+    ok = (start_ids.notna() & end_ids.notna() & started.notna()).to_numpy()
+    start = start_ids[ok].astype("category")
+    end = end_ids[ok].astype("category")
+    stations = start.cat.categories.union(end.cat.categories)
+    m = len(stations)
+    i = start.cat.set_categories(stations).cat.codes.to_numpy(dtype=np.int64)
+    j = end.cat.set_categories(stations).cat.codes.to_numpy(dtype=np.int64)
+    started = started[ok]
+    slot = (started.dt.dayofweek.to_numpy(dtype=np.int64) * 24
+            + started.dt.hour.to_numpy(dtype=np.int64))
+    keys, counts = np.unique((slot * m + i) * m + j, return_counts=True)
+    return {
+        "od_stations": stations.to_numpy(dtype=str),
+        "od_keys": keys.astype(np.int64),
+        "od_counts": counts.astype(np.int64),
+    }
+
+def file_partials(df):
+    # all partials cached for one trip file
+    hours = df["started_at"].dropna().values.astype("datetime64[h]").astype(np.int64)
+    hourly_start, hourly = bincount_partial(hours)
+    return {
+        "hourly_start": np.int64(hourly_start),
+        "hourly": hourly,
+        "duration_hist": duration_histogram(df["started_at"], df["ended_at"]),
+        **station_table(df["start_station_id"], df["start_lat"], df["start_lng"]),
+        **origin_grid(df["start_lat"], df["start_lng"]),
+        **od_table(df["start_station_id"], df["end_station_id"], df["started_at"]),
+    }
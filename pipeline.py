@@ -0,0 +1,333 @@
+import os
+import ast
+import json
+import time
+import pickle
+import hashlib
+import inspect
+import argparse
+import importlib
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from trip_store import DATA_DIR, TRIP_ROOT, find_trip_files, ingest
+from ride_counts import store_signature, load_cube, load_hourly, load_daily
+from parallel import WORKERS
+import weather
+import weather_response
+import precipitation_analysis
+import daily_precip_temp_trends
+import heatmap_analysis
+import monthly_trends
+import dataset_summary
+import maps_analysis
+import od_matrix
+import ride_predictor_app
+import model_benchmark
+from instrumentation import trace_run, merge_trace, instrumented
+
+# Whole analysis suite as a cached dependency graph.
+# Every stage is keyed by a hash of its code (the function, the whole module
+# that defines it and any helper modules it declares), its declared
+# module parameters, its input fingerprints and its dependencies' keys. A
+# stage whose key already has an artifact in CACHE_DIR (and whose output files
+# exist) is skipped, so changing e.g. weather_response.TEMP_BINS reruns only
+# the temperature curve. Stages whose inputs are ready run in parallel on a
+# process pool and pass intermediates (hourly counts, the weather frame, the
+# joined table, model features) to each other through the cache.
+#
+#   python pipeline.py                          # everything
+#   python pipeline.py temp wind                # these stages and what they need
+#   python pipeline.py --set weather_response.TEMP_BINS=40
+#   python pipeline.py --force report
+
+CACHE_DIR     = os.path.join(DATA_DIR, "pipeline_cache")
+LAST_RUN_PATH = os.path.join(CACHE_DIR, "last_run.json")   # stage -> key that wrote its outputs
+OUTPUT_DIR    = "../output"
+STAGE_WORKERS = int(os.environ.get("DIVVY_STAGE_WORKERS", min(4, WORKERS)))
+
+# --- stage functions -------------------------------------------------------
+
+def ingest_store():
+    ingest()
+    return store_signature()
+
+def weather_join(hourly, wdf):
+    return weather_response.join_weather(
+        hourly, wdf, list(weather_response.response_specs().values()))
+
+def response_stage(name):
+    def stage(joined):
+        weather_response.render(joined, name)
+    return stage
+
+# --- input fingerprints ------------------------------------------------------
+
+def trip_fingerprint():
+    return [[os.path.relpath(p, TRIP_ROOT), os.path.getsize(p), os.stat(p).st_mtime_ns]
+            for p in find_trip_files(TRIP_ROOT)]
+
+def weather_fingerprint():
+    return list(weather.source_state())
+
+def gov_temp_fingerprint():
+    path = monthly_trends.GOV_TEMP_CSV
+    return [path, os.path.getsize(path), os.stat(path).st_mtime_ns] if os.path.exists(path) else path
+
+# "deps" are passed to func in order, "after" only order and key the stage;
+# "params" are module attributes hashed into the key; "code" lists modules
+# besides func's own whose source is hashed into it; "outputs" are globs
+# that must exist (each matching at least one file) for a cached stage to
+# count as done. They are looked up under OUTPUT_DIR, which is relative to
+# the cwd like the modules that write there, or under "output_dir", the
+# module attribute holding the absolute folder a stage writes to instead.
+RESPONSE_IQR = ["weather_response.RIDES_IQR", "weather_response.TEMP_IQR", "weather_response.WIND_IQR"]
+
+STAGES = {
+    "ingest":   {"func": ingest_store, "fingerprint": trip_fingerprint,
+                 "code": ["trip_store", "partials", "timestamps", "ride_ids"]},
+    "weather":  {"func": weather.load_weather, "fingerprint": weather_fingerprint},
+    "cube":     {"func": load_cube, "after": ["ingest"], "code": ["partials"]},
+    "hourly":   {"func": load_hourly, "after": ["cube"]},
+    "daily":    {"func": load_daily, "after": ["cube"]},
+    "weather_join": {"func": weather_join, "deps": ["hourly", "weather"], "code": ["weather_response"]},
+    "temp": {
+        "func": response_stage("temp"), "deps": ["weather_join"], "code": ["weather_response", "plotting"],
+        "params": ["weather_response.TEMP_BINS", "weather_response.SAMPLE_SIZE"] + RESPONSE_IQR,
+        "outputs": ["rides_vs_temp_percentiles.csv", "rides_vs_temp_percentiles.png"],
+    },
+    "humidity": {
+        "func": response_stage("humidity"), "deps": ["weather_join"], "code": ["weather_response", "plotting"],
+        "params": ["weather_response.HUMIDITY_BINS", "weather_response.SAMPLE_SIZE"] + RESPONSE_IQR,
+        "outputs": ["rides_vs_humidity_percentiles.csv", "rides_vs_humidity_percentiles.png"],
+    },
+    "wind": {
+        "func": response_stage("wind"), "deps": ["weather_join"], "code": ["weather_response", "plotting"],
+        "params": ["weather_response.WIND_BINS", "weather_response.SAMPLE_SIZE"] + RESPONSE_IQR,
+        "outputs": ["rides_vs_wind_median.csv", "rides_vs_wind_median.png"],
+    },
+    "precipitation": {
+        "func": precipitation_analysis.analyze, "deps": ["daily", "weather"],
+        "code": ["weather_response", "quantile_sketch"],
+        "params": ["precipitation_analysis.PRCP_BINS", "precipitation_analysis.SAMPLE_SIZE",
+                   "precipitation_analysis.PRECIP_SPEC", "quantile_sketch.SKETCH_K"],
+        "outputs": ["rides_vs_daily_precip_percentiles.csv",
+                    "rides_vs_daily_precip_percentiles.png"],
+    },
+    "rain_temp": {
+        "func": daily_precip_temp_trends.analyze, "deps": ["daily", "weather"],
+        "outputs": ["daily_rides_by_rain_temp_category.csv", "daily_rides_rain_temp_bar.png"],
+    },
+    "heatmap": {
+        "func": heatmap_analysis.analyze, "deps": ["cube"], "code": ["calendar_kernels"],
+        "outputs": ["heatmap_hourly_dayofweek.csv", "heatmap_hourly_dayofweek.png"],
+    },
+    "monthly": {
+        "func": monthly_trends.analyze, "deps": ["cube"], "code": ["calendar_kernels"],
+        "params": ["monthly_trends.YEAR"], "fingerprint": gov_temp_fingerprint,
+        "outputs": ["monthly_riders_temp_comparison_*.csv", "monthly_riders_temp_comparison_*.png"],
+    },
+    "summary": {
+        "func": dataset_summary.main, "after": ["ingest"],
+        "params": ["dataset_summary.MIN_DURATION", "dataset_summary.MAX_DURATION",
+                   "dataset_summary.IQR_FACTOR"],
+        "output_dir": "dataset_summary.OUTPUT_DIR",
+        "outputs": ["dataset_summary.csv"],
+    },
+    "maps": {
+        "func": maps_analysis.main, "after": ["ingest"], "code": ["spatial_grid", "partials"],
+        "params": ["maps_analysis.TOP_N", "maps_analysis.HEATMAP_ZOOM",
+                   "maps_analysis.GRADIENT_MODE"],
+        "outputs": ["*.html"],
+    },
+    "od": {
+        "func": od_matrix.main, "after": ["ingest"], "code": ["partials", "spatial_grid"],
+        "params": ["od_matrix.TOP_N"],
+        "outputs": ["od_top_flows*.csv", "od_station_marginals.csv"],
+    },
+    "features": {
+        "func": ride_predictor_app.build_features, "deps": ["hourly", "weather"],
+        "code": ["feature_store"],
+        "params": ["ride_predictor_app.DATE_START", "ride_predictor_app.DATE_END",
+                   "feature_store.FEATURE_VERSION", "feature_store.LAGS",
+                   "feature_store.PRECIP_WINDOWS", "feature_store.TEMP_WINDOWS"],
+    },
+    "models": {
+        "func": ride_predictor_app.evaluate, "deps": ["features"], "code": ["cv_harness"],
+        "params": ["ride_predictor_app.FEATURES"],
+        "output_dir": "ride_predictor_app.EVAL_DIR",
+        "outputs": ["model_evaluation_metrics.csv", "*_timeseries_full.png"],
+    },
+    "benchmark": {
+        "func": model_benchmark.run, "deps": ["features"], "code": ["cv_harness"],
+        "params": ["model_benchmark.BENCHMARK_MODELS", "model_benchmark.CV_SPLITS",
+                   "ride_predictor_app.FEATURES"],
+        "output_dir": "ride_predictor_app.EVAL_DIR",
+        "outputs": ["model_benchmark.csv"],
+    },
+    "report": {
+        "func": ride_predictor_app.write_report, "deps": ["models"], "after": ["benchmark"],
+        "output_dir": "ride_predictor_app.EVAL_DIR",
+        "outputs": ["index.html"],
+    },
+}
+
+# --- runner ----------------------------------------------------------------
+
+def requires(name):
+    spec = STAGES[name]
+    return spec.get("deps", []) + spec.get("after", [])
+
+def plan(targets):
+    # targets plus everything they depend on, dependencies first
+    order = []
+    def visit(name):
+        if name not in order:
+            for dep in requires(name):
+                visit(dep)
+            order.append(name)
+    for name in targets:
+        visit(name)
+    return order
+
+def apply_overrides(overrides):
+    # "module.NAME=value" strings; values are Python literals or plain strings
+    for item in overrides:
+        target, value = item.split("=", 1)
+        module, attr = target.rsplit(".", 1)
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        setattr(importlib.import_module(module), attr, value)
+
+def param_value(param):
+    module, attr = param.rsplit(".", 1)
+    return getattr(importlib.import_module(module), attr)
+
+def code_sources(spec):
+    # the function's source, its module's (unless it is a wrapper defined in
+    # this file) and those of the modules in "code"
+    func = inspect.unwrap(spec["func"])
+    modules = list(spec.get("code", []))
+    own = inspect.getmodule(func)
+    if own is not None and own.__name__ not in ("__main__", __name__):
+        modules.insert(0, own.__name__)
+    return [inspect.getsource(func)] + [inspect.getsource(importlib.import_module(m)) for m in modules]
+
+def stage_key(name, keys):
+    spec = STAGES[name]
+    h = hashlib.sha256(name.encode())
+    for source in code_sources(spec):
+        h.update(source.encode())
+    for dep in requires(name):
+        h.update(keys[dep].encode())
+    for param in spec.get("params", []):
+        h.update(f"{param}={param_value(param)!r}".encode())
+    if "fingerprint" in spec:
+        h.update(repr(spec["fingerprint"]()).encode())
+    return h.hexdigest()
+
+def artifact_path(name, key):
+    return os.path.join(CACHE_DIR, f"{name}-{key[:20]}.pkl")
+
+def read_last_run():
+    if not os.path.exists(LAST_RUN_PATH):
+        return {}
+    with open(LAST_RUN_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_last_run(last):
+    tmp = LAST_RUN_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(last, f, indent=1, sort_keys=True)
+    os.replace(tmp, LAST_RUN_PATH)
+
+def is_cached(name, key, last):
+    # output files are shared between keys, so they only count when this key
+    # was the last one to write them
+    if not os.path.exists(artifact_path(name, key)):
+        return False
+    outputs = STAGES[name].get("outputs", [])
+    if outputs and last.get(name) != key:
+        return False
+    folder = param_value(STAGES[name]["output_dir"]) if "output_dir" in STAGES[name] else OUTPUT_DIR
+    return all(glob(os.path.join(folder, pattern)) for pattern in outputs)
+
+def load_artifact(name, key):
+    with open(artifact_path(name, key), "rb") as f:
+        return pickle.load(f)
+
+def run_stage(name, keys, overrides):
+    # executes in a worker: load inputs from the cache, run, store the result
+    apply_overrides(overrides)
+    spec = STAGES[name]
+    args = [load_artifact(dep, keys[dep]) for dep in spec.get("deps", [])]
+    t0 = time.perf_counter()
+    # in a worker this is a run of its own, merged into the pipeline trace
+    with trace_run(name, save=False) as st:
+        result = spec["func"](*args)
+    seconds = time.perf_counter() - t0
+    path = artifact_path(name, keys[name])
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return name, seconds, st.trace
+
+def run(targets=None, overrides=(), force=(), workers=None):
+    apply_overrides(overrides)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    order = plan(targets or list(STAGES))
+    keys = {}
+    for name in order:
+        keys[name] = stage_key(name, keys)
+    last = read_last_run()
+    todo = [n for n in order if n in force or not is_cached(n, keys[n], last)]
+    done = set(order) - set(todo)
+    for name in order:
+        if name in done:
+            print(f"♻️ {name} (cached)")
+    if not todo:
+        return keys
+
+    workers = STAGE_WORKERS if workers is None else workers
+    if workers <= 1:
+        for name in todo:
+            print(f"✅ {name} ({run_stage(name, keys, overrides)[1]:.1f}s)")
+            last[name] = keys[name]
+            write_last_run(last)
+        return keys
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while todo or running:
+            for name in [n for n in todo if all(d in done for d in requires(n))]:
+                todo.remove(name)
+                running[pool.submit(run_stage, name, keys, overrides)] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+                name, seconds, trace = future.result()
+                merge_trace(trace)
+                done.add(name)
+                last[name] = keys[name]
+                write_last_run(last)
+                print(f"✅ {name} ({seconds:.1f}s)")
+    return keys
+
+@instrumented("pipeline")
+def main():
+    parser = argparse.ArgumentParser(description="Run the analysis suite as a cached stage graph.")
+    parser.add_argument("stages", nargs="*", help=f"stages to build (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        metavar="MODULE.NAME=VALUE", help="override a module parameter")
+    parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                        help="rerun a stage even if it is cached")
+    parser.add_argument("--workers", type=int, help="stages run at once")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    run(args.stages, args.overrides, args.force, args.workers)
+    print(f"🏁 Pipeline finished in {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    main()
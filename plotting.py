@@ -0,0 +1,133 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")   # file output only; also what the pool workers draw with
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from parallel import WORKERS
+from instrumentation import stage
+
+# Figure specs rendered in a process pool, with long lines downsampled first.
+# A spec is a plain dict: path, figsize, title, axis labels and a list of
+# layers ({"kind": "line" | "scatter", "x", "y", plus matplotlib kwargs}).
+# figure() downsamples every line layer in the calling process, so only a few
+# thousand points per line are pickled to the workers; render() draws the
+# specs concurrently with the Agg backend.
+#
+# Downsampling keeps the visual shape of the line:
+#   "minmax": first, min, max and last point of each pixel column's x range,
+#             so every spike still reaches its true height
+#   "lttb":   largest-triangle-three-buckets, POINTS_PER_PIXEL points per
+#             pixel, each maximising the triangle area with its neighbours
+
+PLOT_WORKERS     = int(os.environ.get("DIVVY_PLOT_WORKERS", min(4, WORKERS)))
+DOWNSAMPLE       = "minmax"    # "minmax", "lttb" or None
+POINTS_PER_PIXEL = 2           # lttb points per horizontal pixel; shorter lines are kept whole
+
+def as_numbers(x):
+    # datetimes -> int64 ns so buckets and areas can be computed
+    x = np.asarray(x)
+    return x.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(x.dtype, np.datetime64) else x
+
+def minmax_indices(x, y, n_buckets):
+    # positions of the first, min, max and last point in each of n_buckets
+    # equal-width x ranges (x sorted ascending)
+    x = as_numbers(x).astype(np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64), nan=0.0)
+    span = x[-1] - x[0] or 1.0
+    bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], len(y))
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+    pos = np.arange(len(y))
+    picks = [starts, ends - 1]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(y, starts)
+        hit = y == extreme[group]
+        first = np.full(len(starts), len(y), dtype=np.int64)
+        np.minimum.at(first, group[hit], pos[hit])
+        picks.append(first)
+    return np.unique(np.concatenate(picks))
+
+def lttb_indices(x, y, n_out):
+    # largest-triangle-three-buckets; keeps the first and last point
+    n = len(y)
+    x = as_numbers(x).astype(np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64), nan=0.0)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # mean of every bucket, used as the third triangle vertex for the previous bucket
+    sums_x = np.add.reduceat(x[:n - 1], edges[:-1]) if n > 2 else np.zeros(0)
+    sums_y = np.add.reduceat(y[:n - 1], edges[:-1]) if n > 2 else np.zeros(0)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample(x, y, width_px, method=None):
+    # (x, y) reduced for a line width_px pixels wide
+    method = DOWNSAMPLE if method is None else method
+    x, y = np.asarray(x), np.asarray(y)
+    n_out = width_px * POINTS_PER_PIXEL
+    if not method or len(y) <= n_out or n_out < 3:
+        return x, y
+    if method == "minmax":
+        idx = minmax_indices(x, y, width_px)
+    elif method == "lttb":
+        idx = lttb_indices(x, y, n_out)
+    else:
+        raise ValueError(f"unknown downsample method {method!r}")
+    return x[idx], y[idx]
+
+def figure(path, layers, title="", xlabel="", ylabel="", figsize=(10, 4), legend=True, dpi=None):
+    # figure spec with every line layer downsampled to the figure's pixel width
+    dpi = dpi or plt.rcParams["figure.dpi"]
+    width_px = int(figsize[0] * dpi)
+    layers = [dict(layer) for layer in layers]
+    for layer in layers:
+        if isinstance(layer["x"], pd.Index):
+            layer["x"] = layer["x"].to_numpy()
+        if layer["kind"] == "line":
+            layer["x"], layer["y"] = downsample(layer["x"], layer["y"], width_px)
+    return {"path": str(path), "layers": layers, "title": title, "xlabel": xlabel,
+            "ylabel": ylabel, "figsize": figsize, "legend": legend, "dpi": dpi}
+
+def draw(spec):
+    # render one figure spec to its PNG (runs in a worker)
+    fig, ax = plt.subplots(figsize=spec["figsize"], dpi=spec["dpi"])
+    for layer in spec["layers"]:
+        kwargs = {k: v for k, v in layer.items() if k not in ("kind", "x", "y")}
+        if layer["kind"] == "line":
+            ax.plot(layer["x"], layer["y"], **kwargs)
+        else:
+            ax.scatter(layer["x"], layer["y"], **kwargs)
+    ax.set_title(spec["title"])
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    if spec["legend"]:
+        ax.legend()
+    fig.tight_layout()
+    os.makedirs(os.path.dirname(spec["path"]) or ".", exist_ok=True)
+    fig.savefig(spec["path"])
+    plt.close(fig)
+    return spec["path"]
+
+def render(specs, workers=None):
+    # draw independent figure specs concurrently; returns their paths in order
+    specs = list(specs)
+    workers = PLOT_WORKERS if workers is None else workers
+    workers = max(1, min(workers, len(specs)))
+    with stage("render plots", rows_in=len(specs)):
+        if workers == 1:
+            return [draw(s) for s in specs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(draw, specs))
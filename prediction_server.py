@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+from model_registry import registered_names, serving_model, load_model
+from feature_store import LAG_FEATURES, ROLLING_FEATURES, read_features, rows_at
+from instrumentation import stage, instrumented
+
+# Local HTTP service for hourly ride predictions from registered models.
+# Models are loaded once at startup (memory-mapped from the registry). Every
+# request thread puts its rows on the model's queue and waits; one batching
+# thread per model drains the queue for up to MAX_WAIT_MS or MAX_BATCH_ROWS
+# rows and runs a single vectorized predict for the whole batch. Each model
+# takes the features listed in its registry meta; a dict row with a "time"
+# gets the features it leaves out (lags, rolling weather, ...) from the
+# feature store, so serving reads the same matrix as training. The store is
+# read from its cache (never ingested or rebuilt here) at startup when a
+# model uses lag or rolling features, otherwise on the first row with a
+# "time". It ends at the last ingested hour: later times have no stored
+# lags or weather, so forecasts must send every feature in the row.
+#
+#   POST /predict  {"rows": [{"temp": 21.5, "precip": 0, ...}, ...], "model": "RandomForest"}
+#                  {"rows": [{"time": "2024-06-01 08:00", "temp": 25}]}
+#                  rows may also be lists in the model's feature order
+#   GET  /stats    request/row/batch counters, latency percentiles, throughput
+#   GET  /health   loaded models and versions
+
+HOST           = "127.0.0.1"
+PORT           = int(os.environ.get("DIVVY_PREDICT_PORT", 8765))
+DEFAULT_MODEL  = "GradientBoosting"
+MAX_BATCH_ROWS = 4096
+MAX_WAIT_MS    = 2.0
+LATENCY_WINDOW = 10_000   # most recent request latencies kept for percentiles
+LISTEN_BACKLOG = 256      # pending connections the socket accepts
+STORE_ONLY     = LAG_FEATURES + ROLLING_FEATURES   # features clients don't compute themselves
+
+class StoreUnavailable(RuntimeError):
+    pass
+
+class FeatureStore:
+    # the cached feature store, read once on first use
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.feats = None
+
+    def get(self):
+        with self.lock:
+            if self.feats is None:
+                try:
+                    self.feats = read_features()
+                except (OSError, ValueError) as e:
+                    raise StoreUnavailable(f"feature store unavailable: {e}") from e
+            return self.feats
+
+class MicroBatcher:
+    # groups concurrent predict calls for one model into batched predicts
+    def __init__(self, name, model, features, stats):
+        self.name = name
+        self.model = model
+        self.features = features
+        self.stats = stats
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.loop, name=f"batch-{name}", daemon=True)
+        self.thread.start()
+
+    def predict(self, X):
+        job = {"X": X, "done": threading.Event()}
+        self.queue.put(job)
+        job["done"].wait()
+        if "error" in job:
+            raise job["error"]
+        return job["y"]
+
+    def collect(self):
+        # first job blocks; then take whatever arrives within MAX_WAIT_MS
+        jobs = [self.queue.get()]
+        rows = len(jobs[0]["X"])
+        deadline = time.perf_counter() + MAX_WAIT_MS / 1000
+        while rows < MAX_BATCH_ROWS:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                job = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            rows += len(job["X"])
+        return jobs
+
+    def run(self, X):
+        return np.clip(self.model.predict(pd.DataFrame(X, columns=self.features)), 0, None)
+
+    def loop(self):
+        while True:
+            jobs = self.collect()
+            X = np.vstack([j["X"] for j in jobs])
+            try:
+                y = self.run(X)
+            except Exception:   # retry each request alone so only the bad one fails
+                self.retry(jobs)
+                continue
+            self.stats.batch(len(jobs), len(X))
+            start = 0
+            for j in jobs:
+                j["y"] = y[start:start + len(j["X"])]
+                start += len(j["X"])
+                j["done"].set()
+
+    def retry(self, jobs):
+        # one predict per job, so only the failing requests get the error
+        for j in jobs:
+            try:
+                j["y"] = self.run(j["X"])
+                self.stats.batch(1, len(j["X"]))
+            except Exception as e:
+                j["error"] = e
+            j["done"].set()
+
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.rows = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def batch(self, requests, rows):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += requests
+            self.rows += rows
+
+    def request(self, seconds, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += not ok
+            if ok:
+                self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            lat = np.array(self.latencies) * 1000
+            uptime = time.time() - self.started
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99]) if len(lat) else (None,) * 3
+            return {
+                "uptime_s": round(uptime, 3),
+                "requests": self.requests,
+                "errors": self.errors,
+                "rows": self.rows,
+                "batches": self.batches,
+                "requests_per_batch": self.batched_requests / self.batches if self.batches else None,
+                "rows_per_s": self.rows / uptime if uptime else None,
+                "latency_ms": {"p50": p50, "p90": p90, "p99": p99, "max": lat.max() if len(lat) else None},
+            }
+
+def parse_rows(rows, features, store=None):
+    # JSON rows (dicts keyed by feature or lists in features order) -> float
+    # matrix; dict rows with a "time" are completed from the feature store
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("'rows' must be a non-empty list")
+    if isinstance(rows[0], dict):
+        given = pd.DataFrame(rows)
+        times = feats = None
+        if "time" in given:
+            if store is None:
+                raise ValueError("rows with a 'time' need the feature store")
+            feats = store.get()
+            times = pd.DatetimeIndex(pd.to_datetime(given.pop("time"))).floor("h")
+            stored = rows_at(feats, times, features).reset_index(drop=True)
+            given = given.combine_first(stored)   # values sent in the request win
+        missing = [f for f in features if f not in given or given[f].isna().any()]
+        if missing and times is not None and (times > feats.index.max()).any():
+            raise ValueError(
+                f"rows after {feats.index.max()} (the last hour in the feature store) have no "
+                f"stored {missing}; the store only covers ingested hours, so forecasts "
+                f"(and lag models in particular) must send these values in each row")
+        if missing:
+            raise ValueError(f"rows are missing {missing}")
+        rows = given[features]
+    X = np.asarray(rows, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != len(features):
+        raise ValueError(f"each row needs {len(features)} values: {features}")
+    if not np.isfinite(X).all():   # null / NaN / inf would otherwise reach the model
+        bad = sorted(set(np.flatnonzero(~np.isfinite(X).all(axis=1)).tolist()))
+        raise ValueError(f"rows {bad} have missing or non-finite values")
+    return X
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive for clients that reuse connections
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=float).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.server.stats.snapshot())
+        elif self.path == "/health":
+            self.send_json(200, {"models": self.server.versions, "default": self.server.default})
+        else:
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            name = request.get("model", self.server.default)
+            if name not in self.server.batchers:
+                raise ValueError(f"unknown model {name!r}; loaded: {sorted(self.server.batchers)}")
+            batcher = self.server.batchers[name]
+            y = batcher.predict(parse_rows(request.get("rows"), batcher.features, self.server.store))
+        except StoreUnavailable as e:
+            self.server.stats.request(time.perf_counter() - t0, ok=False)
+            self.send_json(503, {"error": str(e)})
+            return
+        except (ValueError, TypeError, json.JSONDecodeError) as e:
+            self.server.stats.request(time.perf_counter() - t0, ok=False)
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:   # answer rather than drop the connection
+            self.server.stats.request(time.perf_counter() - t0, ok=False)
+            self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self.server.stats.request(time.perf_counter() - t0)
+        self.send_json(200, {"model": name, "version": self.server.versions[name],
+                             "predictions": y.tolist()})
+
+    def log_message(self, format, *args):
+        pass   # one line per request would dominate the latency
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG   # socketserver's default of 5 resets bursts of clients
+
+def make_server(host=HOST, port=PORT, names=None, default=DEFAULT_MODEL):
+    # load the serving version of each registered model and bind the server;
+    # port=0 picks a free port (server.server_address has the real one)
+    names = names or registered_names()
+    if not names:
+        raise RuntimeError("no models registered; run ride_predictor_app.py first")
+    server = PredictionServer((host, port), PredictionHandler)
+    server.stats = ServerStats()
+    server.store = FeatureStore()
+    server.batchers, server.versions = {}, {}
+    with stage("load models", rows_in=len(names)):
+        for name in names:
+            meta = serving_model(name)
+            server.batchers[name] = MicroBatcher(name, load_model(meta), meta["features"], server.stats)
+            server.versions[name] = meta["version"]
+    if any(f in STORE_ONLY for b in server.batchers.values() for f in b.features):
+        try:
+            server.store.get()
+        except StoreUnavailable as e:
+            print(f"⚠️ {e}; lag models can only answer rows that carry every feature")
+    server.default = default if default in server.batchers else names[0]
+    return server
+
+def start_server(host=HOST, port=0, names=None):
+    # serve from a background thread (for tests and notebooks); stop with
+    # server.shutdown()
+    server = make_server(host, port, names)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@instrumented("prediction_server")
+def main():
+    parser = argparse.ArgumentParser(description="Serve hourly ride predictions over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", action="append", dest="models",
+                        help="model name to load (default: every registered model)")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.models)
+    host, port = server.server_address[:2]
+    print(f"🚀 Serving {', '.join(f'{n} v{v:04d}' for n, v in server.versions.items())} "
+          f"on http://{host}:{port} (default {server.default})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
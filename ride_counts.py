@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pandas as pd
+from trip_store import DATA_DIR, ingest, load_partials, read_manifest
+from partials import merge_partials
+from instrumentation import stage, traced, instrumented
+
+# Materialized ride-count cube shared by every analysis.
+# Hourly counts are stored as a dense int32 array keyed by hours since the
+# epoch (hourly[i] is the hour start_hour + i), with day and month rollups.
+# The cube is merged from the per-file partials cached by ingest and rebuilt
+# only when an ingested file changes.
+
+CUBE_PATH = os.path.join(DATA_DIR, "ride_counts.npz")
+
+def store_signature():
+    # one "csv|content hash" entry per ingested file; any change invalidates the cube
+    manifest = read_manifest()
+    return np.array([f"{rel}|{manifest[rel]['hash']}" for rel in sorted(manifest)], dtype=str)
+
+def hourly_partials():
+    # cached per-file hourly counts from the ingest manifest
+    for p in load_partials("hourly_start", "hourly"):
+        yield int(p["hourly_start"]), p["hourly"]
+
+def rollup(start_hour, hourly, unit):
+    # sum dense hourly counts into dense day ("D") or month ("M") buckets
+    hours = np.arange(start_hour, start_hour + len(hourly)).astype("datetime64[h]")
+    codes = hours.astype(f"datetime64[{unit}]").astype(np.int64)
+    if len(codes) == 0:
+        return 0, np.zeros(0, dtype=np.int32)
+    c0 = codes[0]
+    counts = np.bincount(codes - c0, weights=hourly).astype(np.int32)
+    return c0, counts
+
+def build_cube(signature=None):
+    print("⚙️ Building ride-count cube…")
+    if signature is None:
+        signature = store_signature()
+    with stage("merge hourly partials") as st:
+        start_hour, hourly = merge_partials(hourly_partials())
+        st.rows_out = len(hourly)
+    with stage("day and month rollups", rows_in=len(hourly)):
+        start_day, daily = rollup(start_hour, hourly, "D")
+        start_month, monthly = rollup(start_hour, hourly, "M")
+    cube = {
+        "start_hour": np.int64(start_hour), "hourly": hourly,
+        "start_day": np.int64(start_day), "daily": daily,
+        "start_month": np.int64(start_month), "monthly": monthly,
+        "signature": signature,
+    }
+    os.makedirs(os.path.dirname(CUBE_PATH), exist_ok=True)
+    tmp = CUBE_PATH + ".tmp.npz"
+    np.savez(tmp, **cube)
+    os.replace(tmp, CUBE_PATH)
+    return cube
+
+def load_cube():
+    ingest()
+    signature = store_signature()
+    if os.path.exists(CUBE_PATH):
+        with np.load(CUBE_PATH) as z:
+            cube = {k: z[k] for k in z.files}
+        if np.array_equal(cube["signature"], signature):
+            return cube
+    return build_cube(signature)
+
+def to_series(start, counts, unit, name="ride_count"):
+    index = pd.DatetimeIndex(
+        np.arange(start, start + len(counts)).astype(f"datetime64[{unit}]")
+                                             .astype("datetime64[ns]"))
+    return pd.Series(counts, index=index.rename("started_at"), name=name)
+
+@traced("load hourly counts")
+def load_hourly():
+    cube = load_cube()
+    return to_series(int(cube["start_hour"]), cube["hourly"], "h")
+
+@traced("load daily counts")
+def load_daily():
+    cube = load_cube()
+    return to_series(int(cube["start_day"]), cube["daily"], "D")
+
+def load_monthly():
+    cube = load_cube()
+    return to_series(int(cube["start_month"]), cube["monthly"], "M")
+
+@instrumented("ride_counts")
+def main():
+    cube = build_cube()
+    print(f"✅ Cube saved to {CUBE_PATH}: {len(cube['hourly'])} hours, "
+          f"{int(cube['hourly'].sum())} rides")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from timestamps import string_buffer, byte_matrix
+
+# Exact ride_id deduplication at about 8 bytes per ride.
+# Divvy ride_ids are 16 hex characters, i.e. one 64-bit number, so they are
+# decoded straight from the Arrow string buffer into uint64 (ids in any other
+# format are hashed to uint64 instead). Seen ids live on disk as sorted,
+# memory-mapped .npy runs; a lookup is a binary search per run and runs are
+# merged pairwise as they grow, so there are only O(log n) of them.
+
+ID_WIDTH = 16
+
+HEX = np.full(256, 255, dtype=np.uint8)
+for i, ch in enumerate("0123456789abcdef"):
+    HEX[ord(ch)] = i
+    HEX[ord(ch.upper())] = i
+
+def decode_ride_ids(values):
+    # (uint64 ids, mask of rows that have an id)
+    data, starts, lengths = string_buffer(values)
+    nib = HEX[byte_matrix(data, starts, lengths, ID_WIDTH)]
+    ok = (lengths == ID_WIDTH) & (nib < 16).all(axis=1)
+    packed = np.ascontiguousarray((nib[:, 0::2] << 4) | nib[:, 1::2])
+    ids = packed.view(">u8").ravel().astype(np.uint64)
+    present = np.asarray(pd.notna(values))
+    odd = present & ~ok
+    if odd.any():
+        ids[odd] = pd.util.hash_array(np.asarray(values, dtype=object)[odd])
+    return ids, present
+
+class RideIdSet:
+    # disk-backed set of uint64 ride ids stored as sorted runs under root
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.paths = sorted(glob.glob(os.path.join(root, "run-*.npy")))
+        self.runs = [np.load(p, mmap_mode="r") for p in self.paths]
+        self.next = int(os.path.basename(self.paths[-1])[4:10]) + 1 if self.paths else 0
+
+    def __len__(self):
+        return sum(len(r) for r in self.runs)
+
+    def contains(self, ids):
+        found = np.zeros(len(ids), dtype=bool)
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, ids), len(run) - 1)
+            found |= run[pos] == ids
+        return found
+
+    def add_new(self, ids):
+        # keep-mask for ids seen for the first time, both in this set and
+        # earlier in ids; the new ids are added to the set
+        uniq, first = np.unique(ids, return_index=True)
+        new = ~self.contains(uniq)
+        keep = np.zeros(len(ids), dtype=bool)
+        keep[first[new]] = True
+        self.append(uniq[new])
+        return keep
+
+    def write_run(self, ids):
+        path = os.path.join(self.root, f"run-{self.next:06d}.npy")
+        self.next += 1
+        tmp = os.path.join(self.root, f"tmp-{os.path.basename(path)}")
+        np.save(tmp, ids)
+        os.replace(tmp, path)
+        return path
+
+    def append(self, sorted_ids):
+        if len(sorted_ids) == 0:
+            return
+        self.paths.append(self.write_run(sorted_ids))
+        self.runs.append(np.load(self.paths[-1], mmap_mode="r"))
+        # merge the newest runs while they are of similar size
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            merged = np.concatenate(self.runs[-2:])
+            merged.sort(kind="stable")   # two sorted runs: a linear merge
+            old = self.paths[-2:]
+            del self.runs[-2:], self.paths[-2:]
+            self.paths.append(self.write_run(merged))
+            self.runs.append(np.load(self.paths[-1], mmap_mode="r"))
+            for p in old:
+                os.remove(p)
+
+    def clear(self):
+        self.runs = []
+        for p in self.paths:
+            os.remove(p)
+        self.paths = []
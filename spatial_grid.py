@@ -0,0 +1,53 @@
+import numpy as np
+
+# Hierarchical grid for trip-origin density.
+# Cells are Web-Mercator ("slippy map") tiles, the same grid Leaflet uses for
+# zoom levels. Every trip's start_lat/start_lng is binned once at the finest
+# level and coarser levels are derived by shifting the tile indices, so all
+# ZOOM_LEVELS come from one vectorized pass. Cells are keyed x << 32 | y.
+
+ZOOM_LEVELS = (10, 12, 14, 16)
+
+def tile_xy(lat, lng, zoom):
+    # integer tile indices at this zoom
+    n = 1 << zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511))
+    x = np.floor((np.asarray(lng, dtype=np.float64) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n)
+    return (np.clip(x, 0, n - 1).astype(np.int64),
+            np.clip(y, 0, n - 1).astype(np.int64))
+
+def cell_keys(x, y):
+    return (x << 32) | y
+
+def cell_centers(keys, zoom):
+    # (lat, lng) of each cell center
+    n = 1 << zoom
+    x = (keys >> 32) + 0.5
+    y = (keys & 0xFFFFFFFF) + 0.5
+    lng = x / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y / n))))
+    return lat, lng
+
+def grid_counts(lat, lng, zooms=ZOOM_LEVELS):
+    # {zoom: (cell keys, counts)} for every point with both coordinates
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    ok = np.isfinite(lat) & np.isfinite(lng)
+    top = max(zooms)
+    x, y = tile_xy(lat[ok], lng[ok], top)
+    out = {}
+    for z in zooms:
+        keys, counts = np.unique(cell_keys(x >> (top - z), y >> (top - z)), return_counts=True)
+        out[z] = (keys, counts.astype(np.int64))
+    return out
+
+def merge_cells(parts):
+    # sum (keys, counts) pairs from several files
+    parts = list(parts)
+    if not parts:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    keys = np.concatenate([k for k, _ in parts])
+    counts = np.concatenate([c for _, c in parts])
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
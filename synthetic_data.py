@@ -0,0 +1,203 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from instrumentation import stage, instrumented
+
+# Synthetic Divvy-shaped inputs for benchmarks and offline runs.
+# Writes a data folder laid out like ../data:
+#   bikes_raw/YYYYMM-divvy-tripdata.csv   trips in the public Divvy schema
+#   weather/weather.csv                   hourly YEAR/MO/DY/HR/TEMP/PRCP/HMDT/WND_SPD/ATM_PRESS
+#   weather_raw/chicago_monthly_avg_temp_weathergov.csv
+# Hourly weather follows a seasonal and daily temperature cycle with rain
+# spells; trips per hour follow a weekday/weekend commute profile scaled down
+# by cold and rain, so the weather curves and models have a signal to find.
+# Stations have Zipf-like popularity around the Loop; electric bikes are
+# sometimes undocked (no station, jittered coordinates). Rows are generated
+# and written a month (and at most CHUNK_ROWS rows) at a time.
+#
+#   python synthetic_data.py 1m /tmp/divvy-1m
+#   DIVVY_DATA_DIR=/tmp/divvy-1m DIVVY_WEATHER_DIR=/tmp/divvy-1m/weather python pipeline.py
+
+SCALES      = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+START_MONTH = "2021-01"
+MONTHS      = 48
+N_STATIONS  = 800
+CHUNK_ROWS  = 1_000_000
+SEED        = 7
+
+CENTER      = (41.8837, -87.6289)     # the Loop
+UNDOCKED    = 0.12                    # share of electric trips ending away from a station
+MISSING_END = 0.001                   # trips with no end coordinates at all
+
+# relative rides per hour of day
+WEEKDAY_PROFILE = np.array([0.3, 0.2, 0.1, 0.1, 0.2, 0.6, 1.6, 3.2, 4.0, 2.4, 1.8, 2.0,
+                            2.4, 2.4, 2.3, 2.7, 3.6, 4.6, 3.8, 2.7, 2.0, 1.5, 1.0, 0.6])
+WEEKEND_PROFILE = np.array([0.8, 0.6, 0.4, 0.2, 0.2, 0.3, 0.5, 0.9, 1.5, 2.2, 2.9, 3.3,
+                            3.5, 3.6, 3.6, 3.5, 3.3, 3.0, 2.6, 2.1, 1.7, 1.4, 1.1, 0.9])
+
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+def hours_index(start=START_MONTH, months=MONTHS):
+    start = pd.Timestamp(start)
+    return pd.date_range(start, start + pd.DateOffset(months=months), freq="h", inclusive="left")
+
+def make_weather(hours, rng):
+    # hourly weather frame (°C, mm, %, km/h, hPa) indexed by hour
+    doy = hours.dayofyear.to_numpy()
+    hod = hours.hour.to_numpy()
+    n = len(hours)
+    seasonal = 10 - 14 * np.cos(2 * np.pi * (doy - 15) / 365.25)
+    daily = 4 * np.sin(2 * np.pi * (hod - 9) / 24)
+    # slow weather fronts: smoothed noise
+    fronts = np.convolve(rng.normal(0, 1, n + 72), np.ones(72) / 72 ** 0.5, "valid")[:n]
+    temp = seasonal + daily + 1.2 * fronts + rng.normal(0, 1.0, n)
+    raining = np.convolve(rng.random(n + 5) < 0.025, np.ones(6), "valid")[:n] > 0
+    precip = np.where(raining, rng.gamma(0.8, 1.5, n), 0.0)
+    humidity = np.clip(65 - 2 * daily + 20 * raining + rng.normal(0, 8, n), 15, 100)
+    wind = np.abs(rng.normal(16, 7, n) + 4 * raining)
+    pressure = 1015 - 4 * fronts + rng.normal(0, 2, n)
+    wdf = pd.DataFrame({"TEMP": temp.round(1), "PRCP": precip.round(1), "HMDT": humidity.round(),
+                        "WND_SPD": wind.round(1), "ATM_PRESS": pressure.round(1)}, index=hours)
+    # a few sensor dropouts, as in the real data
+    for col in ["HMDT", "WND_SPD", "ATM_PRESS"]:
+        wdf.loc[rng.random(n) < 0.002, col] = -999
+    return wdf
+
+def ride_rates(hours, wdf):
+    # relative expected rides per hour from calendar and weather
+    weekend = hours.dayofweek.to_numpy() >= 5
+    hod = hours.hour.to_numpy()
+    rate = np.where(weekend, WEEKEND_PROFILE[hod], WEEKDAY_PROFILE[hod])
+    temp = wdf["TEMP"].to_numpy()
+    rate = rate / (1 + np.exp(-(temp - 8) / 5))          # cold suppresses riding
+    rate = rate * np.where(wdf["PRCP"].to_numpy() > 0, 0.45, 1.0)
+    return rate * np.exp(-np.clip(temp - 30, 0, None) / 8)   # and so does heat
+
+def make_stations(rng):
+    angle = rng.uniform(0, 2 * np.pi, N_STATIONS)
+    radius = np.abs(rng.normal(0, 0.06, N_STATIONS))
+    lat = CENTER[0] + radius * np.cos(angle) * 1.6
+    lng = CENTER[1] + radius * np.sin(angle)
+    pop = 1 / np.arange(1, N_STATIONS + 1) ** 0.8
+    ids = np.array([f"TA{13000 + i:07d}" for i in range(N_STATIONS)])
+    names = np.array([f"Station {i}" for i in range(N_STATIONS)])
+    return {"lat": lat, "lng": lng, "p": pop / pop.sum(), "id": ids, "name": names}
+
+def ride_ids(rng, n):
+    # 16 upper-case hex characters, like Divvy's ride_id
+    raw = rng.integers(0, 2**63, n, dtype=np.int64).astype(">u8").view(np.uint8).reshape(n, 8)
+    chars = np.empty((n, 16), dtype=np.uint8)
+    chars[:, 0::2] = HEX_DIGITS[raw >> 4]
+    chars[:, 1::2] = HEX_DIGITS[raw & 15]
+    return chars.view("S16").ravel().astype(str)
+
+def make_trips(hour_starts, rng, stations):
+    # one row per entry of hour_starts (datetime64[s] hour of departure)
+    n = len(hour_starts)
+    started = hour_starts + rng.integers(0, 3600, n).astype("timedelta64[s]")
+    minutes = np.clip(rng.lognormal(np.log(11), 0.75, n), 0.05, 60 * 30)
+    ended = started + (minutes * 60).astype("timedelta64[s]")
+
+    start_st = rng.choice(N_STATIONS, n, p=stations["p"])
+    end_st = rng.choice(N_STATIONS, n, p=stations["p"])
+    electric = rng.random(n) < 0.55
+    kind = np.where(electric, "electric_bike", np.where(rng.random(n) < 0.97, "classic_bike", "docked_bike"))
+    undocked_start = electric & (rng.random(n) < UNDOCKED)
+    undocked_end = electric & (rng.random(n) < UNDOCKED)
+
+    def coords(st, undocked, digits):
+        jitter = np.where(undocked, 1, 0) * rng.normal(0, 0.003, (2, n))
+        lat = stations["lat"][st] + jitter[0]
+        lng = stations["lng"][st] + jitter[1]
+        return lat.round(digits), lng.round(digits)
+
+    start_lat, start_lng = coords(start_st, undocked_start, 6)
+    end_lat, end_lng = coords(end_st, undocked_end, 6)
+    gone = rng.random(n) < MISSING_END
+    end_lat[gone] = np.nan
+    end_lng[gone] = np.nan
+
+    def station(col, st, undocked):
+        return pa.array(np.where(undocked, None, stations[col][st]), type=pa.string())
+
+    return pa.table({
+        "ride_id": ride_ids(rng, n),
+        "rideable_type": kind,
+        "started_at": pa.array(started.astype("datetime64[s]")),
+        "ended_at": pa.array(ended.astype("datetime64[s]")),
+        "start_station_name": station("name", start_st, undocked_start),
+        "start_station_id": station("id", start_st, undocked_start),
+        "end_station_name": station("name", end_st, undocked_end | gone),
+        "end_station_id": station("id", end_st, undocked_end | gone),
+        "start_lat": start_lat, "start_lng": start_lng,
+        "end_lat": end_lat, "end_lng": end_lng,
+        "member_casual": np.where(rng.random(n) < 0.64, "member", "casual"),
+    })
+
+def write_weather(out, wdf):
+    wdir = os.path.join(out, "weather")
+    os.makedirs(wdir, exist_ok=True)
+    idx = wdf.index
+    table = pd.DataFrame({"YEAR": idx.year, "MO": idx.month, "DY": idx.day, "HR": idx.hour})
+    table = pd.concat([table, wdf.reset_index(drop=True)], axis=1)
+    table.to_csv(os.path.join(wdir, "weather.csv"), index=False)
+
+    gov_dir = os.path.join(out, "weather_raw")
+    os.makedirs(gov_dir, exist_ok=True)
+    monthly = wdf["TEMP"].groupby(idx.month).mean().round().astype(int)
+    pd.DataFrame({"datetime": monthly.index, "TEMP": monthly.to_numpy()}).to_csv(
+        os.path.join(gov_dir, "chicago_monthly_avg_temp_weathergov.csv"), index=False)
+
+def generate(out, rows, start=START_MONTH, months=MONTHS, seed=SEED):
+    # write rows synthetic trips over months starting at start, plus weather
+    rng = np.random.default_rng(seed)
+    hours = hours_index(start, months)
+    # weather a month either side, like a real archive covering the trips
+    with stage("synthetic weather") as st:
+        wdf = make_weather(hours_index(pd.Timestamp(start) - pd.DateOffset(months=1), months + 2), rng)
+        write_weather(out, wdf)
+        st.rows_out = len(wdf)
+    rate = ride_rates(hours, wdf.loc[hours])
+    counts = rng.multinomial(rows, rate / rate.sum())
+    stations = make_stations(rng)
+
+    trip_dir = os.path.join(out, "bikes_raw")
+    os.makedirs(trip_dir, exist_ok=True)
+    hour_values = hours.to_numpy().astype("datetime64[s]")
+    month_of = hours.strftime("%Y%m").to_numpy()
+    options = pacsv.WriteOptions(quoting_style="none", include_header=False)
+    with stage("synthetic trips", rows_out=rows):
+        for month in pd.unique(month_of):
+            sel = np.flatnonzero(month_of == month)
+            starts = np.repeat(hour_values[sel], counts[sel])
+            rng.shuffle(starts)   # real exports are not sorted by start time
+            path = os.path.join(trip_dir, f"{month}-divvy-tripdata.csv")
+            with open(path, "wb") as f:
+                writer = None
+                for i in range(0, max(len(starts), 1), CHUNK_ROWS):
+                    table = make_trips(starts[i:i + CHUNK_ROWS], rng, stations)
+                    if writer is None:   # unquoted header, as in the Divvy exports
+                        f.write((",".join(table.column_names) + "\n").encode())
+                        writer = pacsv.CSVWriter(f, table.schema, write_options=options)
+                    writer.write_table(table)
+                writer.close()
+            print(f"📝 {os.path.basename(path)}: {len(starts):,} trips")
+    print(f"✅ {rows:,} synthetic trips and {len(wdf):,} weather hours in {out}")
+
+@instrumented("synthetic_data")
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Divvy trip and weather CSVs.")
+    parser.add_argument("scale", help=f"{', '.join(SCALES)} or a row count")
+    parser.add_argument("out", help="data folder to create (use as DIVVY_DATA_DIR)")
+    parser.add_argument("--start", default=START_MONTH)
+    parser.add_argument("--months", type=int, default=MONTHS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    rows = SCALES.get(args.scale.lower()) or int(args.scale)
+    generate(args.out, rows, args.start, args.months, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the scripts import each other as top-level modules from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DIVVY_TRACE", "0")
+os.environ.setdefault("DIVVY_TRACE_QUIET", "1")
+os.environ.setdefault("MPLBACKEND", "Agg")
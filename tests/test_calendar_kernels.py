@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar
+from calendar_kernels import calendar_codes, civil_from_days, grid, grid_frame, holiday_days, hour_counts, to_hours
+
+def epoch_hours(index):
+    return index.to_numpy().astype("datetime64[h]").astype(np.int64)
+
+def test_codes_match_pandas():
+    # every hour from 1999 to 2031 covers 53-week ISO years, years whose
+    # ISO year starts in December and leap years
+    index = pd.date_range("1999-01-01", "2031-12-31 23:00", freq="h")
+    codes = calendar_codes(epoch_hours(index))
+    iso = index.isocalendar()
+    assert np.array_equal(codes["hour"], index.hour)
+    assert np.array_equal(codes["dow"], index.dayofweek)
+    assert np.array_equal(codes["day"], index.day)
+    assert np.array_equal(codes["month"], index.month)
+    assert np.array_equal(codes["year"], index.year)
+    assert np.array_equal(codes["doy"], index.dayofyear)
+    assert np.array_equal(codes["week"], iso["week"].to_numpy())
+    assert np.array_equal(codes["iso_year"], iso["year"].to_numpy())
+
+def test_civil_from_days_round_trips():
+    days = pd.date_range("1600-01-01", "2400-12-31", freq="D")
+    year, month, day = civil_from_days(days.to_numpy().astype("datetime64[D]").astype(np.int64))
+    assert np.array_equal(year, days.year) and np.array_equal(month, days.month)
+    assert np.array_equal(day, days.day)
+
+def test_holidays_match_pandas_federal_calendar():
+    got = holiday_days(1990, 2040)
+    expected = USFederalHolidayCalendar().holidays("1990-01-01", "2040-12-31")
+    expected = expected.to_numpy().astype("datetime64[D]").astype(np.int64)
+    start, end = expected.min(), expected.max()
+    assert got[(got >= start) & (got <= end)].tolist() == expected.tolist()
+
+def test_day_type():
+    index = pd.DatetimeIndex(["2023-07-04", "2023-07-05", "2023-07-08",
+                              "2021-12-31", "2022-12-26", "2021-06-18", "2020-06-19"])
+    codes = calendar_codes(epoch_hours(index))
+    # Independence Day, a workday, Saturday, New Year 2022 observed on
+    # Friday, Christmas 2022 observed on Monday, Juneteenth 2021 observed,
+    # Juneteenth before 2021
+    assert codes["day_type"].tolist() == [2, 0, 1, 2, 2, 2, 0]
+
+def test_grid_matches_groupby_mean():
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2022-11-28", "2023-02-10 05:00", freq="h")
+    counts = rng.poisson(20, len(index)) * (rng.random(len(index)) < 0.8)
+    hourly = pd.Series(counts, index=index)
+    start = int(epoch_hours(index[:1])[0])
+    g = grid_frame(grid(start, counts, ["hour", "dow"]))
+    expected = hourly.groupby([index.hour, index.dayofweek]).mean().unstack()
+    assert np.array_equal(g.to_numpy(), expected.to_numpy())
+    weeks = grid(start, counts, ["iso_year", "week"])
+    iso = index.isocalendar()
+    expected = hourly.groupby([iso["year"].to_numpy(), iso["week"].to_numpy()]).sum()
+    total = grid_frame(weeks, "total").stack()
+    assert total[total > 0].astype(np.int64).to_dict() == expected.to_dict()
+
+def test_hour_counts_matches_resample():
+    rng = np.random.default_rng(1)
+    ns = rng.integers(pd.Timestamp("1969-12-30").value, pd.Timestamp("1970-01-03").value, 3000)
+    stamps = ns.view("datetime64[ns]").copy()
+    stamps[::11] = np.datetime64("NaT")
+    start, counts = hour_counts(np.array_split(stamps, 4))
+    expected = pd.Series(1, index=pd.DatetimeIndex(stamps).dropna()).sort_index().resample("h").count()
+    assert start == epoch_hours(expected.index[:1])[0]
+    assert counts.tolist() == expected.tolist()
+    assert to_hours(ns, "ns").tolist() == to_hours(ns.view("datetime64[ns]")).tolist()   # floors before 1970
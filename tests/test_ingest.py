@@ -0,0 +1,131 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import parallel
+import trip_store
+from ride_ids import RideIdSet, decode_ride_ids
+
+COLUMNS = ["ride_id", "rideable_type", "started_at", "ended_at",
+           "start_station_name", "start_station_id", "end_station_name", "end_station_id",
+           "start_lat", "start_lng", "end_lat", "end_lng", "member_casual"]
+
+def ride_id(n):
+    return f"{n:016X}"
+
+@pytest.fixture
+def raw(tmp_path, monkeypatch):
+    # an empty trip folder with the store, manifest and id set under tmp_path
+    store = tmp_path / "bikes_store"
+    monkeypatch.setattr(trip_store, "STORE_ROOT", str(store))
+    monkeypatch.setattr(trip_store, "MANIFEST_PATH", str(store / "manifest.json"))
+    monkeypatch.setattr(trip_store, "PARTIALS_DIR", str(store / "partials"))
+    monkeypatch.setattr(trip_store, "RIDE_IDS_DIR", str(store / "ride_ids"))
+    monkeypatch.setattr(parallel, "WORKERS", 1)
+    root = tmp_path / "bikes_raw"
+    root.mkdir()
+    return root
+
+def write_trips(root, month, ids):
+    # one trip per id, an hour apart from 08:00 on the 1st of the month
+    start = pd.Timestamp(f"{month[:4]}-{month[4:]}-01 08:00") + pd.to_timedelta(range(len(ids)), unit="h")
+    df = pd.DataFrame({
+        "ride_id": [ride_id(i) for i in ids],
+        "rideable_type": "classic_bike",
+        "started_at": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "ended_at": (start + pd.Timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S"),
+        "start_station_name": "A", "start_station_id": "S1",
+        "end_station_name": "B", "end_station_id": "S2",
+        "start_lat": 41.88, "start_lng": -87.63, "end_lat": 41.89, "end_lng": -87.62,
+        "member_casual": "member",
+    }, columns=COLUMNS)
+    path = root / f"{month}-divvy-tripdata.csv"
+    df.to_csv(path, index=False)
+    return path
+
+def ingest(root):
+    trip_store.ingest(root=str(root))
+    return trip_store.read_manifest()
+
+def stored_ids(month=None):
+    parts = trip_store.list_partitions(month)
+    ids = [pd.read_parquet(p, columns=["ride_id"])["ride_id"] for p in parts]
+    return sorted(int(i, 16) for s in ids for i in s)
+
+def hourly_total():
+    return sum(int(p["hourly"].sum()) for p in trip_store.load_partials("hourly"))
+
+def test_duplicates_within_one_file(raw):
+    write_trips(raw, "202301", [1, 2, 1, 3, 2])
+    manifest = ingest(raw)
+    entry = manifest["202301-divvy-tripdata.csv"]
+    assert (entry["rows"], entry["ids"], entry["duplicates"]) == (5, 3, 2)
+    assert stored_ids() == [1, 2, 3]
+    assert hourly_total() == 3   # cached partials are rewritten without the duplicates
+
+def test_duplicates_across_files_first_path_wins(raw):
+    write_trips(raw, "202301", [1, 2, 3])
+    write_trips(raw, "202302", [3, 4])
+    manifest = ingest(raw)
+    assert manifest["202301-divvy-tripdata.csv"]["duplicates"] == 0
+    assert manifest["202302-divvy-tripdata.csv"]["duplicates"] == 1
+    assert stored_ids("202301") == [1, 2, 3]
+    assert stored_ids("202302") == [4]
+    assert hourly_total() == 4
+
+def test_incremental_file_loses_to_stored_rows(raw):
+    write_trips(raw, "202302", [3, 4])
+    ingest(raw)
+    # added later but sorting earlier: the stored copy of ride 3 is kept
+    write_trips(raw, "202301", [1, 2, 3])
+    manifest = ingest(raw)
+    assert manifest["202302-divvy-tripdata.csv"]["duplicates"] == 0
+    assert manifest["202301-divvy-tripdata.csv"]["duplicates"] == 1
+    assert stored_ids("202302") == [3, 4]
+    assert stored_ids("202301") == [1, 2]
+    assert len(RideIdSet(trip_store.RIDE_IDS_DIR)) == 4
+
+def test_rerun_is_a_no_op(raw):
+    write_trips(raw, "202301", [1, 2])
+    write_trips(raw, "202302", [2, 3])
+    before = ingest(raw)
+    assert ingest(raw) == before
+    assert stored_ids() == [1, 2, 3]
+
+def test_removed_file_reingests_everything(raw):
+    first = write_trips(raw, "202301", [1, 2, 3])
+    write_trips(raw, "202302", [3, 4])
+    ingest(raw)
+    partition = os.path.join(trip_store.STORE_ROOT, trip_store.read_manifest()[first.name]["partition"])
+    os.remove(first)
+    manifest = ingest(raw)
+    assert list(manifest) == ["202302-divvy-tripdata.csv"]
+    assert manifest["202302-divvy-tripdata.csv"]["duplicates"] == 0
+    assert not os.path.exists(partition)
+    assert stored_ids() == [3, 4]   # ride 3 is no longer claimed by the removed file
+    assert len(RideIdSet(trip_store.RIDE_IDS_DIR)) == 2
+
+def test_ride_id_set_merges_runs_and_persists(tmp_path):
+    seen = RideIdSet(str(tmp_path))
+    rng = np.random.default_rng(0)
+    batches = [rng.integers(0, 5000, 1000).astype(np.uint64) for _ in range(8)]
+    expected = set()
+    for ids in batches:
+        keep = seen.add_new(ids)
+        kept = ids[keep]
+        assert len(np.unique(kept)) == len(kept)              # each id kept once per batch
+        assert not (set(kept.tolist()) & expected)            # and never once it was seen
+        assert set(ids.tolist()) - expected == set(kept.tolist())
+        expected |= set(kept.tolist())
+    assert len(seen) == len(expected)
+    assert len(seen.runs) <= int(np.log2(len(expected))) + 1
+    reopened = RideIdSet(str(tmp_path))
+    probe = np.arange(6000, dtype=np.uint64)
+    assert reopened.contains(probe).tolist() == [i in expected for i in range(6000)]
+
+def test_decode_ride_ids():
+    ids, present = decode_ride_ids(pd.Series([ride_id(255), "ffffffffffffffff", None, "not-hex"],
+                                             dtype="string[pyarrow]"))
+    assert present.tolist() == [True, True, False, True]
+    assert ids[:2].tolist() == [255, 2**64 - 1]
+    assert ids[3] not in (ids[0], ids[1])   # other formats are hashed
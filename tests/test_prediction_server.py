@@ -0,0 +1,106 @@
+import json
+import http.client
+import threading
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+import model_registry
+import prediction_server
+
+FEATURES = ["temp", "hour"]
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # one registered model (rides = 2 * temp + hour + 1) served on a free localhost port
+    monkeypatch.setattr(model_registry, "REGISTRY_DIR", str(tmp_path / "models"))
+    X = pd.DataFrame({"temp": [0.0, 10.0, 0.0, 10.0], "hour": [0.0, 0.0, 12.0, 12.0]})
+    model = LinearRegression().fit(X, 2 * X["temp"] + X["hour"] + 1)
+    model_registry.save_model("LinearRegression", model, {"features": FEATURES})
+    server = prediction_server.start_server(port=0, names=["LinearRegression"])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def call(server, method, path, body=None):
+    host, port = server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+def test_predict(server):
+    status, out = call(server, "POST", "/predict", json.dumps(
+        {"rows": [{"temp": 20, "hour": 8}, {"hour": 0, "temp": 5}], "model": "LinearRegression"}))
+    assert status == 200
+    assert out["model"] == "LinearRegression" and out["version"] == 1
+    assert out["predictions"] == pytest.approx([49.0, 11.0])
+    status, out = call(server, "POST", "/predict", json.dumps({"rows": [[20, 8]]}))
+    assert status == 200
+    assert out["predictions"] == pytest.approx([49.0])
+
+@pytest.mark.parametrize("body", [
+    "[1, 2]",                                   # valid JSON, not an object
+    "{not json",
+    json.dumps({"rows": [{"temp": 20}]}),        # missing feature
+    json.dumps({"rows": []}),
+    json.dumps({"rows": [[1, 2, 3]]}),           # wrong row width
+    json.dumps({"rows": [[None, 2]]}),           # null in a list row
+    json.dumps({"rows": [[float("nan"), 2]]}),
+    json.dumps({"rows": [[1, 2]], "model": "Nope"}),
+])
+def test_malformed_request(server, body):
+    status, out = call(server, "POST", "/predict", body)
+    assert status == 400
+    assert out["error"]
+
+def test_server_error_is_answered(server):
+    class Broken:
+        def predict(self, X):
+            raise RuntimeError("boom")
+    server.batchers["LinearRegression"].model = Broken()
+    status, out = call(server, "POST", "/predict", json.dumps({"rows": [[1, 2]]}))
+    assert status == 500
+    assert "boom" in out["error"]
+    assert call(server, "GET", "/stats")[1]["errors"] == 1
+
+def test_bad_request_does_not_fail_its_batch(server, monkeypatch):
+    # a good and a bad request share one micro-batch; only the bad one fails
+    class Picky:
+        def __init__(self, model):
+            self.model = model
+            self.batches = []
+        def predict(self, X):
+            self.batches.append(len(X))
+            if (X["temp"] < -100).any():
+                raise ValueError("temp out of range")
+            return self.model.predict(X)
+    batcher = server.batchers["LinearRegression"]
+    batcher.model = picky = Picky(batcher.model)
+    monkeypatch.setattr(prediction_server, "MAX_WAIT_MS", 500)   # wait for both requests
+    bodies = {"good": {"rows": [[20, 8]]}, "bad": {"rows": [[-500, 8]]}}
+    results = {}
+    def send(key):
+        results[key] = call(server, "POST", "/predict", json.dumps(bodies[key]))
+    threads = [threading.Thread(target=send, args=(k,)) for k in bodies]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert picky.batches[0] == 2                  # tried together first
+    assert results["good"] == (200, {"model": "LinearRegression", "version": 1,
+                                     "predictions": pytest.approx([49.0])})
+    assert results["bad"][0] == 400 and "temp out of range" in results["bad"][1]["error"]
+
+def test_stats(server):
+    call(server, "POST", "/predict", json.dumps({"rows": [[1, 2], [3, 4]]}))
+    call(server, "POST", "/predict", "[1, 2]")
+    status, stats = call(server, "GET", "/stats")
+    assert status == 200
+    assert stats["requests"] == 2 and stats["errors"] == 1
+    assert stats["rows"] == 2 and stats["batches"] == 1
+    assert stats["latency_ms"]["p50"] is not None
+    status, health = call(server, "GET", "/health")
+    assert health == {"models": {"LinearRegression": 1}, "default": "LinearRegression"}
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+import weather_response
+from quantile_sketch import QuantileSketch, BinnedSketch, ReservoirSample, iqr_bounds
+
+QS = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+
+def rank_error(sketch, values, qs):
+    # largest distance, as a fraction of n, between each sketch quantile's
+    # rank in values and the rank asked for
+    values = np.sort(values)
+    est = sketch.quantile(qs)
+    lo = np.searchsorted(values, est, side="left")
+    hi = np.searchsorted(values, est, side="right")
+    want = np.asarray(qs) * (len(values) - 1)
+    return np.max(np.maximum(0, np.maximum(lo - want, want - hi))) / len(values)
+
+def test_exact_up_to_k():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(4, 1, 1000)
+    sketch = QuantileSketch(k=1000)
+    for chunk in np.array_split(values, 7):
+        sketch.update(chunk)
+    assert sketch.exact()
+    assert sketch.quantile(QS).tolist() == np.quantile(values, QS).tolist()
+    assert sketch.quantile(QS).tolist() == pd.Series(values).quantile(QS).tolist()
+    assert (sketch.n, sketch.min, sketch.max) == (1000, values.min(), values.max())
+
+def test_nan_skipped_and_empty():
+    assert np.isnan(QuantileSketch().quantile(0.5))
+    sketch = QuantileSketch().update([1.0, np.nan, 3.0])
+    assert sketch.n == 2 and sketch.quantile(0.5) == 2.0
+
+def test_rank_error_above_k():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(4, 1, 50_000)
+    sketch = QuantileSketch(k=512)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    assert not sketch.exact()
+    assert sum(len(level) for level in sketch.levels) < 5 * 512   # far fewer than n kept
+    assert rank_error(sketch, values, QS[1:-1]) < 0.01
+    assert sketch.quantile([0, 1]).tolist() == [values.min(), values.max()]
+
+def test_merge_equals_union():
+    rng = np.random.default_rng(2)
+    parts = [rng.normal(size=n) for n in (300, 1, 700, 0)]
+    merged = QuantileSketch(k=2000)
+    for part in parts:
+        merged.merge(QuantileSketch(k=2000).update(part))
+    union = np.concatenate(parts)
+    assert merged.n == len(union)
+    assert merged.quantile(QS).tolist() == np.quantile(union, QS).tolist()
+    assert iqr_bounds(merged, 1.5) == pytest.approx(iqr_bounds(QuantileSketch(k=2000).update(union), 1.5))
+
+def test_merge_above_k_keeps_rank_error():
+    rng = np.random.default_rng(3)
+    parts = [rng.exponential(size=20_000) for _ in range(4)]
+    merged = QuantileSketch(k=512)
+    for part in parts:
+        merged.merge(QuantileSketch(k=512).update(part))
+    assert merged.n == 80_000
+    assert rank_error(merged, np.concatenate(parts), QS[1:-1]) < 0.01
+
+def test_binned_sketch_matches_groupby_cut():
+    rng = np.random.default_rng(4)
+    x = rng.uniform(-10, 30, 4000).round(1)
+    y = rng.poisson(50, 4000)
+    bins = np.linspace(x.min(), x.max(), 30)
+    binned = BinnedSketch(bins)
+    for xs, ys in zip(np.array_split(x, 5), np.array_split(y, 5)):
+        binned.merge(BinnedSketch(bins).update(xs, ys))
+    mids, values = binned.quantiles([0.25, 0.5, 0.75])
+    expected = (pd.Series(y).groupby(pd.cut(x, bins), observed=True)
+                .quantile([0.25, 0.5, 0.75]).unstack())
+    assert list(mids) == list(pd.IntervalIndex(expected.index).mid)
+    for got, q in zip(values, [0.25, 0.5, 0.75]):
+        assert got.tolist() == expected[q].tolist()
+
+def test_reservoir_sample():
+    df = pd.DataFrame({"v": np.arange(1000)})
+    sample = ReservoirSample(100)
+    for start in range(0, 1000, 120):
+        sample.update(df.iloc[start:start + 120])
+    rows = sample.frame()
+    assert len(rows) == 100 and rows["v"].is_unique and rows["v"].isin(df["v"]).all()
+    small = ReservoirSample(100).update(df.iloc[:30])
+    assert len(small.frame()) == 30
+    merged = ReservoirSample(50, seed=5).update(df.iloc[:500]).merge(ReservoirSample(50, seed=6).update(df.iloc[500:]))
+    assert len(merged.frame()) == 50 and merged.frame()["v"].is_unique
+
+@pytest.mark.parametrize("name", ["temp", "humidity", "wind"])
+def test_sketch_curve_matches_response_curve(name):
+    # a few years of hours in yearly chunks: same table and kept rows
+    rng = np.random.default_rng(5)
+    idx = pd.date_range("2021-01-01", periods=3 * 8760, freq="h")
+    df = pd.DataFrame({
+        "ride_count": rng.poisson(40, len(idx)) * rng.integers(0, 3, len(idx)),
+        "TEMP": rng.normal(10, 12, len(idx)).round(1),
+        "humidity": rng.uniform(-5, 100, len(idx)).round(0),
+        "wind": np.where(rng.random(len(idx)) < 0.01, np.nan, rng.gamma(2, 4, len(idx)).round(1)),
+    }, index=idx)
+    spec = weather_response.response_specs()[name]
+    table, mask = weather_response.response_curve(df, spec)
+    def years():
+        return (rows for _, rows in df.groupby(df.index.year))
+    sketched, sample, kept = weather_response.sketch_curve(years, spec, sample_size=500, k=len(df))
+    pd.testing.assert_frame_equal(sketched, table, check_exact=True)
+    assert kept == mask.sum()
+    assert len(sample) == 500 and sample.index.isin(df.index[mask]).all()
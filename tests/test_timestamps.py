@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from timestamps import NAT, days_from_civil, parse_datetime, parse_epoch_seconds, parse_ns
+
+def expected_ns(values):
+    # what the general pandas parser makes of each row
+    parsed = pd.to_datetime(pd.Series(values), format="mixed", errors="coerce")
+    return parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+def test_days_from_civil_matches_pandas():
+    days = pd.date_range("1600-01-01", "2400-12-31", freq="D")
+    got = days_from_civil(days.year.to_numpy(), days.month.to_numpy(), days.day.to_numpy())
+    assert np.array_equal(got, days.to_numpy().astype("datetime64[D]").astype(np.int64))
+
+@pytest.mark.parametrize("values", [
+    # leap days, and the day after February in leap and common years
+    ["2024-02-29 12:00:00", "2020-02-29 00:00:00", "2000-02-29 23:59:59",
+     "2024-03-01 00:00:00", "2023-03-01 00:00:00", "2100-03-01 00:00:00"],
+    # year, month and day boundaries
+    ["2022-12-31 23:59:59", "2023-01-01 00:00:00", "2023-01-31 23:59:59",
+     "2023-04-30 23:59:59", "2023-05-01 00:00:00", "1970-01-01 00:00:00",
+     "1969-12-31 23:59:59"],
+    # fractional seconds of every width, and an ISO "T"
+    ["2023-06-01 08:15:30.5", "2023-06-01 08:15:30.123", "2023-06-01 08:15:30.123456",
+     "2023-06-01 08:15:30.123456789", "2023-06-01T08:15:30", "2023-06-01 08:15:30"],
+])
+def test_fixed_layouts_match_pandas(values):
+    assert parse_ns(values).tolist() == expected_ns(values).tolist()
+
+def test_malformed_rows():
+    # invalid dates and times are NaT like pandas' coerce; other layouts
+    # fall through to the general parser
+    invalid = ["2023-02-29 10:00:00", "2100-02-29 10:00:00", "2023-13-01 10:00:00",
+               "2023-04-31 10:00:00", "2023-06-01 24:00:00", "2023-06-01 10:60:00",
+               "2023-06-01 10:00:60", "2023-06-0x 10:00:00", "not a date", "", None]
+    assert (parse_ns(invalid) == NAT).all()
+    assert (expected_ns(invalid) == NAT).all()
+    others = ["2023-06-01 10:00", "2023/06/01 10:00:00", "6/1/2023 10:00:00", "2023-6-1 10:00:00"]
+    assert parse_ns(others).tolist() == expected_ns(others).tolist()
+
+def test_mixed_column():
+    # a realistic column: mostly one layout, some fractional, some broken
+    rng = np.random.default_rng(0)
+    ns = rng.integers(pd.Timestamp("2019-01-01").value, pd.Timestamp("2025-01-01").value, 5000)
+    values = pd.Series(pd.to_datetime(ns).strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    values[::7] = pd.to_datetime(ns[::7]).strftime("%Y-%m-%d %H:%M:%S.%f")
+    values[3::50] = "2023-02-29 00:00:00"
+    values[5::50] = None
+    values[9::50] = "2023-06-01 10:00"
+    values = values.astype("string[pyarrow]")
+    assert parse_ns(values).tolist() == expected_ns(values).tolist()
+    assert np.array_equal(parse_datetime(values), pd.to_datetime(values, format="mixed", errors="coerce").to_numpy(),
+                          equal_nan=True)
+
+def test_epoch_seconds_floor():
+    values = ["1969-12-31 23:59:59.5", "1970-01-01 00:00:01.999", None]
+    assert parse_epoch_seconds(values).tolist() == [-1, 1, NAT]
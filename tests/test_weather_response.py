@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+import weather_response
+from weather_response import binned_quantiles, response_mask
+
+QS = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def groupby_cut(x, y, bins, qs):
+    # the old scripts' percentiles: groupby(pd.cut(...)).quantile(...)
+    table = pd.Series(y).groupby(pd.cut(x, bins), observed=True).quantile(qs).unstack()
+    return list(pd.IntervalIndex(table.index).mid), [table[q].tolist() for q in qs]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_binned_quantiles_match_groupby_cut(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(50, 5000))
+    x = rng.normal(10, 12, n).round(1)
+    y = rng.poisson(30, n) * rng.integers(0, 4, n)
+    bins = np.linspace(x.min(), x.max(), int(rng.integers(5, 40)))
+    mids, values = binned_quantiles(x, y, bins, QS)
+    expected_mids, expected = groupby_cut(x, y, bins, QS)
+    assert list(mids) == expected_mids
+    assert [v.tolist() for v in values] == expected
+
+def test_binned_quantiles_edges():
+    # right-closed bins: the lowest edge and values outside are dropped, a
+    # value on an inner edge belongs to the bin on its left; float y too
+    x = np.array([0.0, 1.0, 1.0, 1.5, 2.0, 3.0, -1.0, 5.0])
+    y = np.array([9.0, 1.0, 2.5, 4.0, 6.0, 7.0, 9.0, 9.0])
+    bins = np.array([0.0, 1.0, 2.0, 3.0])
+    mids, values = binned_quantiles(x, y, bins, QS)
+    expected_mids, expected = groupby_cut(x, y, bins, QS)
+    assert list(mids) == expected_mids
+    assert [v.tolist() for v in values] == expected
+
+@pytest.mark.parametrize("name", ["temp", "humidity", "wind"])
+def test_response_curve_matches_pandas(name):
+    # the mask and curve of each spec against the pandas steps of the old
+    # per-variable scripts
+    rng = np.random.default_rng(7)
+    n = 6000
+    df = pd.DataFrame({
+        "ride_count": np.r_[rng.poisson(40, n - 20), rng.poisson(400, 20)],
+        "TEMP": rng.normal(10, 12, n).round(1),
+        "humidity": rng.uniform(-5, 100, n).round(0),
+        "wind": np.where(rng.random(n) < 0.01, np.nan, rng.gamma(2, 4, n).round(1)),
+    })
+    spec = weather_response.response_specs()[name]
+    kept = df.dropna(subset=[spec["name"]])
+    if spec["valid"] is not None:
+        kept = kept[kept[spec["name"]].between(*spec["valid"])]
+    for col, factor in spec["outliers"]:
+        q1, q3 = kept[col].quantile([0.25, 0.75])
+        kept = kept[kept[col].between(q1 - factor * (q3 - q1), q3 + factor * (q3 - q1))]
+    mask = response_mask(df, spec)
+    assert df.index[mask].tolist() == kept.index.tolist()
+    table, _ = weather_response.response_curve(df, spec)
+    x = kept[spec["name"]]
+    bins = np.linspace(x.min(), x.max(), spec["bins"])
+    mids, expected = groupby_cut(x.to_numpy(), kept["ride_count"].to_numpy(), bins, list(spec["stats"].values()))
+    assert table["mid"].tolist() == mids
+    assert [table[s].tolist() for s in spec["stats"]] == expected
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Fixed-layout parser for Divvy started_at/ended_at columns.
+# Divvy writes "YYYY-MM-DD HH:MM:SS", optionally with fractional seconds.
+# The layouts present are detected once per column from the row lengths, and
+# whole columns are converted by slicing digits straight out of the Arrow
+# string buffer; only rows that match no layout go through the general
+# pandas parser.
+
+NAT = np.iinfo(np.int64).min   # same bit pattern numpy uses for NaT
+
+DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+SEPARATORS = {4: "-", 7: "-", 13: ":", 16: ":"}
+
+def string_buffer(values):
+    # (data bytes, row start offsets, row lengths) of an Arrow string column;
+    # nulls come back with length 0
+    arr = pa.array(values, type=pa.large_string(), from_pandas=True)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    _, offsets, data = arr.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, np.uint8)
+    lengths = np.diff(offsets)
+    if arr.null_count:
+        lengths[arr.is_null().to_numpy(zero_copy_only=False)] = 0
+    return data, offsets[:-1], lengths
+
+def detect_layouts(lengths):
+    # fixed layouts present in the column, most common first;
+    # 19 is "YYYY-MM-DD HH:MM:SS", 21-29 add "." and fractional digits
+    counts = np.bincount(lengths, minlength=30)[:30]
+    counts[:19] = 0
+    counts[20] = 0
+    return [int(w) for w in np.argsort(-counts, kind="stable") if counts[w]]
+
+DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def byte_matrix(data, starts, lengths, width):
+    # (rows x width) view of the fixed-width rows; a zero-copy reshape when
+    # every row has the layout width (the usual case), a gather otherwise
+    n = len(starts)
+    if n and lengths.min() == lengths.max() == width and starts[0] + n * width <= len(data):
+        if np.array_equal(np.diff(starts), np.full(n - 1, width)):
+            return data[starts[0]:starts[0] + n * width].reshape(n, width)
+    idx = np.where(lengths == width, starts, 0)
+    pos = np.minimum(idx[:, None] + np.arange(width), max(len(data) - 1, 0))
+    return data[pos] if len(data) else np.zeros((n, width), np.uint8)
+
+def days_from_civil(year, month, day):
+    # proleptic Gregorian date -> days since 1970-01-01
+    y = year - (month <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def parse_fixed(data, starts, lengths, width):
+    # epoch seconds, nanoseconds and a mask of rows that matched the layout
+    mat = byte_matrix(data, starts, lengths, width)
+    ok = lengths == width
+    for i, ch in SEPARATORS.items():
+        ok &= mat[:, i] == ord(ch)
+    ok &= (mat[:, 10] == ord(" ")) | (mat[:, 10] == ord("T"))
+    if width > 19:
+        ok &= mat[:, 19] == ord(".")
+    frac = list(range(20, width))
+    dig = mat[:, DIGITS + frac] - np.uint8(ord("0"))   # non-digits wrap to >9
+    ok &= (dig < 10).all(axis=1)
+    dig = dig.astype(np.int32)
+
+    def num(a, b):
+        v = dig[:, a]
+        for k in range(a + 1, b):
+            v = v * 10 + dig[:, k]
+        return v
+
+    year, month, day = num(0, 4), num(4, 6), num(6, 8)
+    hour, minute, sec = num(8, 10), num(10, 12), num(12, 14)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    mdays = DAYS_IN_MONTH[np.clip(month, 0, 12)] + (leap & (month == 2))
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= mdays)
+    ok &= (hour < 24) & (minute < 60) & (sec < 60)
+
+    secs = (days_from_civil(year, month, day).astype(np.int64) * 86400
+            + (hour * 3600 + minute * 60 + sec))
+    if frac:
+        nanos = num(14, 14 + len(frac)).astype(np.int64) * 10 ** (9 - len(frac))
+    else:
+        nanos = np.zeros(len(secs), np.int64)
+    return secs, nanos, ok
+
+def parse_ns(values):
+    # int64 nanoseconds since the epoch, NAT where unparseable or missing
+    values = pd.Series(values, copy=False)
+    out = np.full(len(values), NAT, dtype=np.int64)
+    data, starts, lengths = string_buffer(values)
+    ok = np.zeros(len(values), dtype=bool)
+    for width in detect_layouts(lengths):
+        rows = lengths == width
+        if rows.all():
+            secs, nanos, good = parse_fixed(data, starts, lengths, width)
+            rows = good
+        else:
+            rows = np.flatnonzero(rows)
+            secs, nanos, good = parse_fixed(data, starts[rows], lengths[rows], width)
+            rows, secs, nanos = rows[good], secs[good], nanos[good]
+            good = slice(None)
+        out[rows] = secs[good] * 1_000_000_000 + nanos[good]
+        ok[rows] = True
+    # general parser only for non-empty rows that didn't match the layout
+    rest = ~ok & (lengths > 0)
+    if rest.any():
+        parsed = pd.to_datetime(values[rest], format="mixed", errors="coerce")
+        out[rest] = parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return out
+
+def parse_datetime(values):
+    # datetime64[ns] array, NaT where unparseable or missing
+    return parse_ns(values).view("datetime64[ns]")
+
+def parse_epoch_seconds(values):
+    # int64 seconds since the epoch, NAT where unparseable or missing
+    ns = parse_ns(values)
+    return np.where(ns == NAT, NAT, ns // 1_000_000_000)
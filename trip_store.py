@@ -0,0 +1,275 @@
+import os
+import json
+import hashlib
+from functools import partial
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from timestamps import parse_datetime
+from parallel import map_files
+from partials import file_partials
+from ride_ids import decode_ride_ids, RideIdSet
+from instrumentation import stage, traced, instrumented
+
+# Month-partitioned Parquet store for the Divvy trip CSVs.
+# Each *-divvy-tripdata.csv is parsed once into a typed, compressed partition
+# under STORE_ROOT/month=YYYYMM/; loaders then read only the columns and
+# months they need instead of re-parsing every CSV on every run.
+# A manifest records each CSV's size, mtime and content hash together with
+# its cached partial aggregates (see partials.py), so a rerun parses only new
+# or changed files.
+# Rides are deduplicated on ride_id across all files against a disk-backed
+# id set (see ride_ids.py), so overlapping or re-downloaded CSVs are counted
+# once. The rule is "already stored wins": a ride stays in the partition
+# that stored it first. Files parsed in the same run claim ids in path
+# order, so a full ingest keeps the copy in the earliest path; a file added
+# later only keeps rides that aren't stored yet, even if it sorts before the
+# file that has them. Removing or changing a stored file re-ingests
+# everything, which makes the result path-ordered again.
+
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR   = os.environ.get("DIVVY_DATA_DIR", os.path.join(BASE_DIR, "..", "data"))
+TRIP_ROOT  = os.path.join(DATA_DIR, "bikes_raw")
+STORE_ROOT = os.path.join(DATA_DIR, "bikes_store")
+MANIFEST_PATH = os.path.join(STORE_ROOT, "manifest.json")
+PARTIALS_DIR  = os.path.join(STORE_ROOT, "partials")
+RIDE_IDS_DIR  = os.path.join(STORE_ROOT, "ride_ids")
+MANIFEST_VERSION = 5   # bump when the cached partials change
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 250_000   # rows per Parquet row group, the unit of streamed reads
+
+TIME_COLS     = ["started_at", "ended_at"]
+FLOAT_COLS    = ["start_lat", "start_lng", "end_lat", "end_lng"]
+CATEGORY_COLS = [
+    "rideable_type", "member_casual",
+    "start_station_name", "start_station_id",
+    "end_station_name", "end_station_id",
+]
+
+def find_trip_files(root=TRIP_ROOT):
+    # every real monthly trip CSV, skipping macOS metadata
+    files = []
+    for dirpath, _, fnames in os.walk(root):
+        if "__MACOSX" in dirpath:
+            continue
+        for fn in fnames:
+            if fn.startswith("._") or not fn.endswith("-divvy-tripdata.csv"):
+                continue
+            files.append(os.path.join(dirpath, fn))
+    return sorted(files)
+
+def month_key(csv_path):
+    # "202301-divvy-tripdata.csv" -> "202301"
+    prefix = os.path.basename(csv_path).split("-", 1)[0]
+    return prefix if prefix.isdigit() else "unknown"
+
+def partition_path(csv_path, root=TRIP_ROOT):
+    # one part per source file, so re-downloads into other folders don't collide
+    rel = os.path.relpath(csv_path, root)
+    tag = hashlib.md5(rel.encode("utf-8")).hexdigest()[:8]
+    fname = os.path.basename(csv_path).replace(".csv", f"-{tag}.parquet")
+    return os.path.join(STORE_ROOT, f"month={month_key(csv_path)}", fname)
+
+def read_trip_csv(csv_path):
+    # parse one raw CSV into the typed store schema
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {c: "category" for c in CATEGORY_COLS if c in header}
+    dtypes.update({c: "float32" for c in FLOAT_COLS if c in header})
+    dtypes.update({c: "string[pyarrow]" for c in TIME_COLS + ["ride_id"] if c in header})
+    df = pd.read_csv(csv_path, dtype=dtypes)
+    for col in TIME_COLS:
+        if col in df.columns:
+            df[col] = parse_datetime(df[col])
+    return df
+
+def partials_path(partition):
+    return os.path.join(PARTIALS_DIR, os.path.basename(partition).replace(".parquet", ".npz"))
+
+def file_hash(path, block=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(block), b""):
+            h.update(buf)
+    return h.hexdigest()
+
+def write_partition(df, out):
+    parts = partials_path(out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    os.makedirs(PARTIALS_DIR, exist_ok=True)
+    tmp = out + ".tmp"
+    df.to_parquet(tmp, compression=COMPRESSION, index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, out)
+    tmp = parts + ".tmp.npz"
+    np.savez(tmp, **file_partials(df))
+    os.replace(tmp, parts)
+    return parts
+
+def ingest_file(csv_path, root=TRIP_ROOT):
+    # parse one CSV into its partition plus cached partials; returns its
+    # manifest entry and the decoded ride ids for deduplication
+    st = os.stat(csv_path)
+    out = partition_path(csv_path, root)
+    df = read_trip_csv(csv_path)
+    parts = write_partition(df, out)
+    if "ride_id" in df.columns:
+        ids, present = decode_ride_ids(df["ride_id"])
+    else:
+        ids, present = np.zeros(0, np.uint64), np.zeros(len(df), dtype=bool)
+    entry = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hash": file_hash(csv_path),
+        "partition": os.path.relpath(out, STORE_ROOT),
+        "partials": os.path.relpath(parts, STORE_ROOT),
+        "rows": len(df),
+    }
+    return entry, ids[present], present
+
+def drop_duplicates(item):
+    # rewrite a partition (and its partials) without the rows in drop
+    partition, drop = item
+    out = os.path.join(STORE_ROOT, partition)
+    df = pd.read_parquet(out)
+    write_partition(df[~drop].reset_index(drop=True), out)
+
+def read_manifest():
+    # {csv path relative to TRIP_ROOT: entry}; empty when missing or outdated
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest["files"]
+
+def write_manifest(entries):
+    os.makedirs(STORE_ROOT, exist_ok=True)
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": entries}, f, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+def is_current(csv_path, entry):
+    # unchanged size/mtime, or same content after a touch/copy
+    if not all(os.path.exists(os.path.join(STORE_ROOT, entry[k]))
+               for k in ("partition", "partials")):
+        return False
+    st = os.stat(csv_path)
+    if (st.st_size, st.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+        return True
+    if st.st_size == entry["size"] and file_hash(csv_path) == entry["hash"]:
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+    return False
+
+def remove_entry(entry):
+    for k in ("partition", "partials"):
+        path = os.path.join(STORE_ROOT, entry[k])
+        if os.path.exists(path):
+            os.remove(path)
+
+@traced("ingest")
+def ingest(root=TRIP_ROOT):
+    # parse only CSVs that are new or changed since the manifest was written.
+    # New files are deduplicated against the ride ids already stored (stored
+    # rows win, whatever the path order); if any stored file changed or
+    # disappeared (or the id set doesn't match the manifest), ids can't be
+    # taken back out of the set, so every file is ingested and deduplicated
+    # again in path order.
+    files = find_trip_files(root)
+    manifest = read_manifest()
+    entries, todo, changed = {}, [], False
+    for fp in files:
+        rel = os.path.relpath(fp, root)
+        entry = manifest.pop(rel, None)
+        if entry is not None and is_current(fp, entry):
+            entries[rel] = entry
+        else:
+            todo.append(fp)
+            changed |= entry is not None
+    for entry in manifest.values():   # source CSV is gone
+        remove_entry(entry)
+        changed = True
+    seen = RideIdSet(RIDE_IDS_DIR)
+    if changed or len(seen) != sum(e["ids"] for e in entries.values()):
+        entries, todo = {}, files
+        seen.clear()
+    redo = []
+    if todo:
+        print(f"Ingesting {len(todo)} of {len(files)} trip files into {STORE_ROOT}…")
+        # parse in parallel, then claim ids file by file in path order
+        with stage("parse trip CSVs", rows_out=0) as st:
+            for fp, (entry, ids, present) in zip(todo, map_files(partial(ingest_file, root=root), todo)):
+                drop = np.zeros(entry["rows"], dtype=bool)
+                keep = seen.add_new(ids)
+                drop[present] = ~keep
+                entry["ids"] = int(keep.sum())
+                entry["duplicates"] = int(drop.sum())
+                if entry["duplicates"]:
+                    redo.append((entry["partition"], drop))
+                entries[os.path.relpath(fp, root)] = entry
+                st.rows_out += entry["rows"]
+                dup = f" ({entry['duplicates']} duplicate rides dropped)" if entry["duplicates"] else ""
+                print("   ", os.path.basename(fp) + dup)
+    if redo:
+        with stage("drop duplicate rides", rows_in=sum(len(d) for _, d in redo)):
+            map_files(drop_duplicates, redo)
+    if todo or entries != read_manifest():
+        write_manifest(entries)
+    return files
+
+def manifest_entries():
+    # manifest entries in source-path order
+    manifest = read_manifest()
+    return [manifest[rel] for rel in sorted(manifest)]
+
+def load_partials(*keys):
+    # per-file cached partials (dicts of the requested arrays) in source-path order
+    for entry in manifest_entries():
+        with np.load(os.path.join(STORE_ROOT, entry["partials"])) as z:
+            yield {k: z[k] for k in keys}
+
+def list_partitions(months=None):
+    # partition files, optionally restricted to month keys with these prefixes
+    # (e.g. "2023" or ["202301", "202302"])
+    if isinstance(months, str):
+        months = [months]
+    parts = []
+    if not os.path.isdir(STORE_ROOT):
+        return parts
+    for d in sorted(os.listdir(STORE_ROOT)):
+        if not d.startswith("month="):
+            continue
+        key = d.split("=", 1)[1]
+        if months is not None and not any(key.startswith(m) for m in months):
+            continue
+        pdir = os.path.join(STORE_ROOT, d)
+        parts.extend(os.path.join(pdir, fn) for fn in sorted(os.listdir(pdir))
+                     if fn.endswith(".parquet"))
+    return parts
+
+def iter_trips(columns, months=None):
+    # yield one frame per partition with only the requested columns
+    ingest()
+    for path in list_partitions(months):
+        yield pd.read_parquet(path, columns=columns)
+
+def iter_chunks(path, columns, chunk_size=ROW_GROUP_SIZE):
+    # stream one partition as frames of at most chunk_size rows
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
+
+def load_trips(columns, months=None):
+    frames = list(iter_trips(columns, months))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+@instrumented("trip_store")
+def main():
+    files = ingest()
+    print(f"✅ {len(files)} trip files available in {STORE_ROOT}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from trip_store import DATA_DIR
+from instrumentation import traced, instrumented
+
+# Cached, typed local copy of the Kaggle Chicago weather database.
+# The raw CSVs are read once into an hourly float32 frame (sentinels cleaned)
+# and saved under CACHE_DIR. Later runs load the cache without touching
+# kagglehub or the network, and rebuild only when the source files change.
+# If the source folder has since disappeared the cache is used as it is.
+# float32 keeps the source's short decimals (13.8 reads back as 13.8) but not
+# the float64 values the CSV parser gave, which IQR cut-offs and bin edges
+# are sensitive to; the analyses widen the columns they use back with
+# as_float64().
+
+WEATHER_DATASET = "curiel/chicago-weather-database"
+WEATHER_DIR = os.environ.get("DIVVY_WEATHER_DIR")   # optional local CSV folder
+CACHE_DIR   = os.path.join(DATA_DIR, "weather_cache")
+CACHE_PATH  = os.path.join(CACHE_DIR, "weather.parquet")
+META_PATH   = os.path.join(CACHE_DIR, "weather_sources.json")
+
+DATE_COLS = ["YEAR", "MO", "DY", "HR"]
+SENTINELS = [-999, -9999]
+
+def download_weather():
+    import kagglehub   # only needed when there is no local copy yet
+    print("📥 Fetching weather data…")
+    weather_path = kagglehub.dataset_download(WEATHER_DATASET)
+    if str(weather_path).endswith(".zip"):
+        import zipfile, pathlib
+        with zipfile.ZipFile(weather_path) as z:
+            z.extractall(pathlib.Path(weather_path).with_suffix(""))
+        weather_path = str(pathlib.Path(weather_path).with_suffix(""))
+    return str(weather_path)
+
+def read_meta():
+    if not os.path.exists(META_PATH):
+        return None
+    with open(META_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def source_dir():
+    # explicit folder, else the folder the cache was built from, else kagglehub
+    if WEATHER_DIR:
+        return WEATHER_DIR
+    meta = read_meta()
+    if meta and os.path.isdir(meta["source_dir"]):
+        return meta["source_dir"]
+    return download_weather()
+
+def source_state():
+    # (source folder, file signature) that keys the cache; with no explicit
+    # folder and the cache's own source gone (kagglehub cache purged, DATA_DIR
+    # copied to an offline node) the cache stands in for its sources
+    if not WEATHER_DIR:
+        meta = read_meta()
+        if meta and os.path.exists(CACHE_PATH) and not os.path.isdir(meta["source_dir"]):
+            return meta["source_dir"], meta["files"]
+    wdir = source_dir()
+    return wdir, source_signature(source_files(wdir))
+
+def source_files(wdir):
+    return sorted(glob.glob(os.path.join(wdir, "*.csv")))
+
+def source_signature(files):
+    return [[os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns]
+            for f in files]
+
+@traced("parse weather CSVs")
+def read_weather_csvs(files):
+    df = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    df.columns = df.columns.str.strip().str.upper()
+    df["datetime"] = pd.to_datetime(
+        df[DATE_COLS].rename(columns={"YEAR":"year","MO":"month","DY":"day","HR":"hour"})
+    )
+    df = df.set_index("datetime").drop(columns=DATE_COLS)
+    df = df.select_dtypes("number").replace(SENTINELS, np.nan)
+    return df.astype("float32")
+
+def as_float64(weather):
+    # float32 weather -> the float64 values the CSVs parse to: each float32's
+    # shortest round-trip decimal is the source text, which a plain cast
+    # (2.9 -> 2.9000000953674316) is not
+    return weather.astype(str).astype(np.float64)
+
+def build_cache(wdir, files, signature):
+    print("⚙️ Building weather cache…")
+    weather = read_weather_csvs(files)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = CACHE_PATH + ".tmp"
+    weather.to_parquet(tmp, compression="zstd")
+    os.replace(tmp, CACHE_PATH)
+    with open(META_PATH, "w", encoding="utf-8") as f:
+        json.dump({"source_dir": wdir, "files": signature}, f, indent=1)
+    return weather
+
+@traced("load weather")
+def load_weather(columns=None):
+    # hourly weather with upper-case columns (TEMP, PRCP, HMDT, WND_SPD, …)
+    wdir, signature = source_state()
+    meta = read_meta()
+    if (os.path.exists(CACHE_PATH) and meta
+            and meta["source_dir"] == wdir and meta["files"] == signature):
+        return pd.read_parquet(CACHE_PATH, columns=columns)
+    weather = build_cache(wdir, source_files(wdir), signature)
+    return weather if columns is None else weather[columns]
+
+@instrumented("weather")
+def main():
+    weather = load_weather()
+    print(f"✅ Weather cache at {CACHE_PATH}: {len(weather)} hourly records, "
+          f"columns {list(weather.columns)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+from ride_counts import load_hourly
+from weather import load_weather, as_float64
+from quantile_sketch import SKETCH_K, QuantileSketch, BinnedSketch, ReservoirSample, iqr_bounds
+import plotting
+from instrumentation import stage, traced, instrumented
+
+# Hourly ride response curves for several weather variables at once.
+# Rides and weather are loaded and joined once; each variable is then a spec
+# (valid range, ordered IQR outlier rules, bin count, quantiles) turned into a
+# boolean mask over the shared join, and its binned quantiles come from one
+# sort plus bincount offsets instead of a groupby per variable. Bins follow
+# pd.cut (right-closed, labels rounded) so the CSVs match the old scripts.
+# sketch_curve() applies the same spec to a stream of frames with the
+# mergeable sketches of quantile_sketch.py, for inputs that arrive in pieces
+# (precipitation_analysis feeds it one year of days at a time).
+
+OUTPUT_DIR    = "../output"
+SAMPLE_SIZE   = 5000
+TEMP_BINS     = 30
+HUMIDITY_BINS = 30
+WIND_BINS     = 30
+RIDES_IQR     = 1.5    # IQR factors of the outlier rules in response_specs()
+TEMP_IQR      = 1.5
+WIND_IQR      = 1.0
+
+sns.set(style="whitegrid")
+plt.rcParams.update({"figure.dpi": 120})
+
+def response_specs():
+    # built on call so the constants above can be changed at runtime
+    return {
+        "temp": {
+            "column": "TEMP", "name": "TEMP", "valid": None,
+            "outliers": [("ride_count", RIDES_IQR), ("TEMP", TEMP_IQR)],
+            "bins": TEMP_BINS,
+            "stats": {"p25": 0.25, "p50": 0.50, "p75": 0.75}, "line": "p50",
+            "output": "rides_vs_temp_percentiles",
+            "xlabel": "Temperature (°C)", "title": "Hourly Rides vs Temperature",
+        },
+        "humidity": {
+            "column": "HMDT", "name": "humidity", "valid": (0, np.inf),
+            "outliers": [("ride_count", RIDES_IQR)],
+            "bins": HUMIDITY_BINS,
+            "stats": {"p25": 0.25, "p50": 0.50, "p75": 0.75}, "line": "p50",
+            "output": "rides_vs_humidity_percentiles",
+            "xlabel": "Humidity (%)", "title": "Hourly Rides vs Humidity (%)",
+        },
+        "wind": {
+            "column": "WND_SPD", "name": "wind", "valid": (0, 40),
+            "outliers": [("wind", WIND_IQR), ("ride_count", RIDES_IQR)],
+            "bins": WIND_BINS,
+            "stats": {"median": 0.50}, "line": "median",
+            "output": "rides_vs_wind_median",
+            "xlabel": "Wind Speed (mph)", "title": "Hourly Rides vs Wind Speed",
+        },
+    }
+
+@traced("join weather")
+def join_weather(hourly, weather, specs):
+    # hourly ride counts inner-joined with every spec's weather column, back
+    # in float64 so cut-offs and bin edges match a run on the raw CSVs
+    weather = weather[[s["column"] for s in specs]]
+    weather = weather.rename(columns={s["column"]: s["name"] for s in specs})
+    joined = hourly.to_frame().join(weather, how="inner")
+    names = [s["name"] for s in specs]
+    joined[names] = as_float64(joined[names])
+    return joined
+
+def load_joined(specs):
+    return join_weather(load_hourly(), load_weather([s["column"] for s in specs]), specs)
+
+def valid_mask(df, spec):
+    # rows where the variable is present and in its valid range
+    x = df[spec["name"]].to_numpy()
+    mask = ~np.isnan(x)
+    if spec["valid"] is not None:
+        lo, hi = spec["valid"]
+        mask &= (x >= lo) & (x <= hi)
+    return mask
+
+def response_mask(df, spec):
+    # rows kept for one variable: present, in range, then each IQR rule on
+    # the rows that survived the previous ones
+    mask = valid_mask(df, spec)
+    for col, factor in spec["outliers"]:
+        v = df[col].to_numpy()
+        q1, q3 = np.quantile(v[mask], [0.25, 0.75])
+        iqr = q3 - q1
+        mask &= (v >= q1 - factor * iqr) & (v <= q3 + factor * iqr)
+    return mask
+
+def binned_quantiles(x, y, bins, qs):
+    # per-bin linear quantiles of y with pd.cut(x, bins) bins: sort once by
+    # (bin, y), find each bin's slice from bincount offsets, then index it
+    nbins = len(bins) - 1
+    idx = np.digitize(x, bins, right=True) - 1
+    ok = (idx >= 0) & (idx < nbins)
+    idx, y = idx[ok], y[ok].astype(np.float64)
+    y = y[np.lexsort((y, idx))]
+    counts = np.bincount(idx, minlength=nbins)
+    used = np.flatnonzero(counts)
+    start = (np.cumsum(counts) - counts)[used]
+    n = counts[used]
+    out = []
+    for q in qs:
+        pos = q * (n - 1)
+        lo = np.floor(pos).astype(np.int64)
+        frac = pos - lo
+        a = y[start + lo]
+        b = y[start + np.minimum(lo + 1, n - 1)]
+        out.append(np.where(frac == 0, a, a + (b - a) * frac))
+    mids = pd.cut(bins[1:], bins).categories.mid[used]
+    return mids, out
+
+def response_curve(df, spec):
+    mask = response_mask(df, spec)
+    x = df[spec["name"]].to_numpy()[mask]
+    bins = np.linspace(x.min(), x.max(), spec["bins"])
+    mids, values = binned_quantiles(x, df["ride_count"].to_numpy()[mask], bins,
+                                    list(spec["stats"].values()))
+    table = pd.DataFrame({"mid": mids, **dict(zip(spec["stats"], values))})
+    return table, mask
+
+def sketch_curve(chunks, spec, sample_size=SAMPLE_SIZE, k=SKETCH_K):
+    # response_curve over a stream of frames (chunks() returns a fresh
+    # iterator each time) without holding them together: one QuantileSketch
+    # pass per IQR rule, one for the kept x range, then one filling the
+    # binned sketches and a scatter sample. Returns (table, sample, rows
+    # kept); the table equals response_curve's while every sketch has seen
+    # at most k values.
+    bounds = []
+    def kept():
+        for df in chunks():
+            mask = valid_mask(df, spec)
+            for (col, _), (lo, hi) in zip(spec["outliers"], bounds):
+                v = df[col].to_numpy()
+                mask &= (v >= lo) & (v <= hi)
+            yield df[mask]
+    for col, factor in spec["outliers"]:
+        sketch = QuantileSketch(k)
+        for df in kept():
+            sketch.update(df[col].to_numpy())
+        bounds.append(iqr_bounds(sketch, factor))
+    x = QuantileSketch(k)   # min, max and count are exact at any size
+    for df in kept():
+        x.update(df[spec["name"]].to_numpy())
+    binned = BinnedSketch(np.linspace(x.min, x.max, spec["bins"]), k)
+    sample = ReservoirSample(sample_size)
+    for df in kept():
+        binned.update(df[spec["name"]].to_numpy(), df["ride_count"].to_numpy())
+        sample.update(df)
+    mids, values = binned.quantiles(list(spec["stats"].values()))
+    table = pd.DataFrame({"mid": mids, **dict(zip(spec["stats"], values))})
+    return table, sample.frame(), x.n
+
+def save_response(df, mask, table, spec):
+    # writes the CSV; returns the plot as a plotting figure spec
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    table.to_csv(os.path.join(OUTPUT_DIR, spec["output"] + ".csv"), index=False)
+
+    kept = df[mask]
+    sample = kept.sample(min(len(kept), SAMPLE_SIZE), random_state=1)
+    return plotting.figure(
+        os.path.join(OUTPUT_DIR, spec["output"] + ".png"),
+        [{"kind": "scatter", "x": sample[spec["name"]].to_numpy(),
+          "y": sample["ride_count"].to_numpy(), "alpha": 0.25, "s": 10},
+         {"kind": "line", "x": table["mid"].to_numpy(), "y": table[spec["line"]].to_numpy(),
+          "color": "red", "label": "Median"}],
+        title=spec["title"], xlabel=spec["xlabel"], ylabel="Rides per hour", figsize=(8, 5))
+
+def render(df, spec, figures=None):
+    # one response curve (CSV + plot) from the shared join; with a figures
+    # list the plot spec is appended for the caller to draw
+    if isinstance(spec, str):
+        spec = response_specs()[spec]
+    print(f"📈 Rides vs {spec['name']}…")
+    with stage(f"binned percentiles: {spec['name']}", rows_in=len(df)) as st:
+        table, mask = response_curve(df, spec)
+        st.rows_out = int(mask.sum())
+    fig = save_response(df, mask, table, spec)
+    if figures is None:
+        plotting.render([fig])
+        print(f"✅ Saved {spec['output']}.png to output/")
+    else:
+        figures.append(fig)
+
+def run(names=None):
+    specs = response_specs()
+    specs = [specs[n] for n in (names or specs)]
+
+    print("📚 Loading hourly ride counts and weather…")
+    df = load_joined(specs)
+
+    figures = []
+    for spec in specs:
+        render(df, spec, figures)
+    for path in plotting.render(figures):
+        print(f"✅ Saved {os.path.basename(path)} to output/")
+
+@instrumented("weather_response")
+def main():
+    run()
+
+if __name__ == "__main__":
+    main()